@@ -1,6 +1,15 @@
 from django.apps import AppConfig
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_save
 
 
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+
+    def ready(self):
+        from .metrics import install_query_wrapper
+        connection_created.connect(install_query_wrapper, dispatch_uid="api.metrics")
+        from .authentication import evict_user_tokens
+        post_save.connect(evict_user_tokens, sender=settings.AUTH_USER_MODEL, dispatch_uid="api.tokens")
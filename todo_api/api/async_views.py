@@ -0,0 +1,134 @@
+"""
+Async read endpoints mounted under ``/api/async/`` for ASGI deployments.
+
+They reuse the viewsets' querysets, filter backends, permissions, pagination
+and serializers, but fetch rows through Django's async ORM so a worker is not
+held while it waits on the database. Everything they run between awaits is
+query-free: filters compare raw FK ids, permissions compare ``created_by_id``
+and the serializers render related fields as primary keys.
+"""
+from functools import wraps
+
+from django.conf import settings
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+
+from rest_framework import exceptions, status
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.views import exception_handler
+
+from . import counters, events
+from .authentication import CachedTokenAuthentication
+from .filters import TaskFilterBackend, aload_preset
+from .routers import ais_sticky, replica_reads
+from .throttling import ConcurrencyLimitMixin, acquire_slot, get_scope, release_slot
+from .views import CategoryViewSet, PriorityViewSet, TaskViewSet
+
+
+def _json(data, status_code=status.HTTP_200_OK):
+    return HttpResponse(JSONRenderer().render(data), status=status_code, content_type="application/json")
+
+
+def async_api_view(func):
+    """
+    Authenticate with the cached token backend and turn API errors into JSON
+    responses, keeping the headers (Retry-After, WWW-Authenticate) DRF set on them.
+    """
+    @wraps(func)
+    async def wrapper(request, *args, **kwargs):
+        if request.method != "GET":
+            return _json({"detail": f'Method "{request.method}" not allowed.'}, status.HTTP_405_METHOD_NOT_ALLOWED)
+        drf_request = None
+        try:
+            auth = await CachedTokenAuthentication().aauthenticate(request)
+            if auth is None:
+                raise exceptions.NotAuthenticated()
+            drf_request = Request(request)
+            drf_request.user, drf_request.auth = auth
+            with replica_reads(not await ais_sticky(drf_request.user.pk)):
+                return await func(drf_request, *args, **kwargs)
+        except (Http404, exceptions.APIException) as exc:
+            if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+                # What APIView.handle_exception does for the WWW-Authenticate header.
+                exc.auth_header = CachedTokenAuthentication().authenticate_header(request)
+            response = exception_handler(exc, {})
+            json_response = _json(response.data, response.status_code)
+            for name, value in response.headers.items():
+                if name.lower() != "content-type":
+                    json_response[name] = value
+            return json_response
+        finally:
+            key = getattr(drf_request, "inflight_key", None)
+            if key is not None:
+                release_slot(key)
+    return wrapper
+
+
+def _view(viewset, request, action, **kwargs):
+    """
+    The viewset instance for ``action`` after its permission, throttle and (for
+    ``ConcurrencyLimitMixin`` viewsets) in-flight checks; the wrapper releases the slot.
+    """
+    view = viewset(request=request, action=action, format_kwarg=None, args=(), kwargs=kwargs)
+    view.check_permissions(request)
+    view.check_throttles(request)
+    if isinstance(view, ConcurrencyLimitMixin):
+        request.inflight_key = acquire_slot(request, get_scope(view))
+    return view
+
+
+def list_view(viewset):
+    @async_api_view
+    async def view_func(request):
+        view = _view(viewset, request, "list")
+        if TaskFilterBackend in view.filter_backends:
+            view.preset_params = await aload_preset(request)
+        queryset = view.filter_queryset(view.get_queryset())
+        page = await view.paginator.apaginate_queryset(queryset, request, view=view)
+        if page is None:
+            page = [obj async for obj in queryset]
+            return _json(view.get_serializer(page, many=True).data)
+        return _json(view.paginator.get_paginated_response(view.get_serializer(page, many=True).data).data)
+    return view_func
+
+
+def retrieve_view(viewset):
+    @async_api_view
+    async def view_func(request, pk):
+        view = _view(viewset, request, "retrieve", pk=pk)
+        try:
+            obj = await view.get_queryset().aget(pk=pk)
+        except view.get_queryset().model.DoesNotExist:
+            raise Http404
+        view.check_object_permissions(request, obj)
+        return _json(view.get_serializer(obj).data)
+    return view_func
+
+
+@async_api_view
+async def task_stats(request):
+    _view(TaskViewSet, request, "stats")
+    return _json(await counters.astats_for(None if request.user.is_staff else request.user))
+
+
+task_list = list_view(TaskViewSet)
+task_detail = retrieve_view(TaskViewSet)
+category_list = list_view(CategoryViewSet)
+category_detail = retrieve_view(CategoryViewSet)
+priority_list = list_view(PriorityViewSet)
+priority_detail = retrieve_view(PriorityViewSet)
+
+
+@async_api_view
+async def event_stream(request):
+    """
+    ``text/event-stream`` of the user's task/category/priority changes (see
+    ``api.events``). Needs an ASGI server: under WSGI the stream never ends.
+    """
+    if events.get_broker().connections(request.user.pk) >= settings.EVENTS_MAX_CONNECTIONS:
+        raise exceptions.Throttled(detail="Too many open event streams.")
+    response = StreamingHttpResponse(events.stream(request.user.pk), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    # Tell nginx not to buffer the stream.
+    response["X-Accel-Buffering"] = "no"
+    return response
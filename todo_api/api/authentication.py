@@ -0,0 +1,88 @@
+import hashlib
+
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import caches
+from django.db import transaction
+
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from .hashers import hashing_slot
+
+
+TOKEN_CACHE = "tokens"
+
+
+def _cache_key(key):
+    return "auth-token:" + hashlib.sha256(key.encode()).hexdigest()
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    ``TokenAuthentication`` that remembers the token -> user lookup in the
+    ``tokens`` cache for its configured TIMEOUT.
+
+    Code that deletes tokens must go through ``revoke_tokens`` so cached entries
+    are dropped with them. The cached token carries its user, so saving a user
+    evicts their entries too (``evict_user_tokens``); a ``QuerySet.update()``
+    of users bypasses that and is seen once the entries time out.
+    """
+
+    def authenticate_credentials(self, key):
+        cache = caches[TOKEN_CACHE]
+        token = cache.get(_cache_key(key))
+        if token is None:
+            user, token = super().authenticate_credentials(key)
+            cache.set(_cache_key(key), token)
+        return token.user, token
+
+    async def aauthenticate(self, request):
+        """``authenticate`` for async views, reading the ``Authorization`` header of a Django request."""
+        auth = request.headers.get("Authorization", "").split()
+        if not auth or auth[0].lower() != self.keyword.lower():
+            return None
+        if len(auth) != 2:
+            raise exceptions.AuthenticationFailed("Invalid token header.")
+
+        cache = caches[TOKEN_CACHE]
+        token = await cache.aget(_cache_key(auth[1]))
+        if token is None:
+            try:
+                token = await Token.objects.select_related("user").aget(key=auth[1])
+            except Token.DoesNotExist:
+                raise exceptions.AuthenticationFailed("Invalid token.")
+            if not token.user.is_active:
+                raise exceptions.AuthenticationFailed("User inactive or deleted.")
+            await cache.aset(_cache_key(auth[1]), token)
+        return token.user, token
+
+
+def revoke_tokens(user):
+    """Delete every token of ``user`` and evict them from the token cache."""
+    keys = list(Token.objects.filter(user=user).values_list("key", flat=True))
+    Token.objects.filter(key__in=keys).delete()
+    caches[TOKEN_CACHE].delete_many([_cache_key(key) for key in keys])
+
+
+def evict_user_tokens(sender, instance, created=False, **kwargs):
+    """``post_save`` receiver: drop the user's cached tokens once the transaction commits."""
+    if created:
+        return
+    keys = list(Token.objects.filter(user_id=instance.pk).values_list("key", flat=True))
+    if keys:
+        transaction.on_commit(lambda: caches[TOKEN_CACHE].delete_many([_cache_key(key) for key in keys]))
+
+
+class PasswordBackend(ModelBackend):
+    """
+    ``ModelBackend`` that holds one password hashing slot for the whole check,
+    so the verify and the rehash or ``harden_runtime`` after it cannot be split
+    by a full hashing queue.
+    """
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        if password is None:
+            return super().authenticate(request, username, password, **kwargs)
+        with hashing_slot():
+            return super().authenticate(request, username, password, **kwargs)
@@ -0,0 +1,112 @@
+import hashlib
+
+from django.db import transaction
+from django.db.models import Count, Max
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, parse_etags, parse_http_date_safe, quote_etag
+
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from rest_framework.response import Response
+
+
+class PreconditionFailed(APIException):
+    status_code = status.HTTP_412_PRECONDITION_FAILED
+    default_detail = "The resource has been modified since it was fetched."
+    default_code = "precondition_failed"
+
+
+def _digest(*parts):
+    return hashlib.sha1("|".join(str(part) for part in parts).encode()).hexdigest()
+
+
+def _strip_weak(etag):
+    return etag[2:] if etag.startswith("W/") else etag
+
+
+class ConditionalGetMixin:
+    """
+    ETag / Last-Modified validators for ``list``, ``retrieve`` and ``update``
+    of models with an ``updated_at`` column.
+
+    A list is validated by ``max(updated_at)`` and ``count(*)`` over the
+    filtered queryset, so a matching ``If-None-Match`` returns 304 before any row
+    is serialized. Lists ignore ``If-Modified-Since``: a row leaving the filtered
+    set does not raise ``max(updated_at)``, only the ETag's count sees it. ``If-Match`` on PUT/PATCH locks
+    the row and answers 412 when it has changed since the client read it.
+    """
+
+    def get_list_validators(self, queryset):
+        stamp = queryset.aggregate(last_modified=Max("updated_at"), count=Count("pk"))
+        return self.list_etag(stamp["last_modified"], stamp["count"]), stamp["last_modified"]
+
+    def list_etag(self, *stamp):
+        """Weak ETag of this user's view of this list URL, given a stamp that changes with its rows."""
+        request = self.request
+        return "W/" + quote_etag(_digest(request.user.pk, request.get_full_path(), request.headers.get("Accept", ""), *stamp))
+
+    def get_object_validators(self, obj):
+        return quote_etag(_digest(obj._meta.label, obj.pk, obj.updated_at.isoformat())), obj.updated_at
+
+    def is_not_modified(self, etag, last_modified):
+        if_none_match = self.request.headers.get("If-None-Match")
+        if if_none_match is not None:
+            return if_none_match.strip() == "*" or _strip_weak(etag) in map(_strip_weak, parse_etags(if_none_match))
+        if self.action == "list":
+            return False
+        if_modified_since = parse_http_date_safe(self.request.headers.get("If-Modified-Since", ""))
+        return (
+            if_modified_since is not None and last_modified is not None
+            and int(last_modified.timestamp()) <= if_modified_since
+        )
+
+    def with_validators(self, response, etag, last_modified):
+        response["ETag"] = etag
+        if last_modified is not None:
+            response["Last-Modified"] = http_date(last_modified.timestamp())
+        patch_cache_control(response, private=True, no_cache=True)
+        patch_vary_headers(response, ["Accept", "Authorization"])
+        return response
+
+    def not_modified(self, etag, last_modified):
+        return self.with_validators(Response(status=status.HTTP_304_NOT_MODIFIED), etag, last_modified)
+
+    def list(self, request, *args, **kwargs):
+        etag, last_modified = self.get_list_validators(self.filter_queryset(self.get_queryset()))
+        if self.is_not_modified(etag, last_modified):
+            return self.not_modified(etag, last_modified)
+        return self.with_validators(super().list(request, *args, **kwargs), etag, last_modified)
+
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+        etag, last_modified = self.get_object_validators(instance)
+        if self.is_not_modified(etag, last_modified):
+            return self.not_modified(etag, last_modified)
+        return self.with_validators(Response(self.get_serializer(instance).data), etag, last_modified)
+
+    def get_object(self):
+        locked = getattr(self, "locked_object", None)
+        return locked if locked is not None else super().get_object()
+
+    def update(self, request, *args, **kwargs):
+        if_match = request.headers.get("If-Match")
+        if if_match is None:
+            response = super().update(request, *args, **kwargs)
+        else:
+            with transaction.atomic():
+                instance = self.get_object()
+                self.locked_object = type(instance)._base_manager.select_for_update().get(pk=instance.pk)
+                etag, _ = self.get_object_validators(self.locked_object)
+                if if_match.strip() != "*" and etag not in parse_etags(if_match):
+                    raise PreconditionFailed()
+                response = super().update(request, *args, **kwargs)
+            self.locked_object = None
+
+        updated = getattr(self, "updated_object", None)
+        if updated is not None:
+            self.with_validators(response, *self.get_object_validators(updated))
+        return response
+
+    def perform_update(self, serializer):
+        super().perform_update(serializer)
+        self.updated_object = serializer.instance
@@ -0,0 +1,143 @@
+from collections import Counter
+from functools import reduce
+from operator import or_
+
+from django.db import IntegrityError, transaction
+from django.db.models import BigIntegerField, Case, Count, F, Q, Sum, Value, When
+
+from .models import Task, TaskCounter
+
+
+DIMENSIONS = ("status", "completed", "category", "priority")
+TOTAL = "total"
+
+
+def _value(value):
+    if value is None:
+        return "null"
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return str(value)
+
+
+def task_keys(task):
+    """The counter buckets a live task contributes one to."""
+    return [
+        (TOTAL, ""),
+        ("status", _value(task.status)),
+        ("completed", _value(task.completed)),
+        ("category", _value(task.category_id)),
+        ("priority", _value(task.priority_id)),
+    ]
+
+
+def apply_delta(user_id, delta):
+    """Add ``delta`` ({(dimension, value): amount}) to a user's counters in a single UPDATE."""
+    delta = {key: amount for key, amount in delta.items() if amount}
+    if not delta:
+        return
+    match = {key: Q(dimension=key[0], value=key[1]) for key in delta}
+    buckets = TaskCounter.objects.filter(reduce(or_, match.values()), user_id=user_id)
+    amount = Case(*(When(match[key], then=Value(n)) for key, n in delta.items()), output_field=BigIntegerField())
+    if buckets.update(count=F("count") + amount) == len(delta):
+        return
+
+    existing = set(buckets.values_list("dimension", "value"))
+    for (dimension, value), n in delta.items():
+        if (dimension, value) in existing:
+            continue
+        try:
+            with transaction.atomic():
+                TaskCounter.objects.create(user_id=user_id, dimension=dimension, value=value, count=n)
+        except IntegrityError:
+            # Created concurrently by another writer; the row exists now.
+            TaskCounter.objects.filter(user_id=user_id, dimension=dimension, value=value).update(count=F("count") + n)
+
+
+def record(user_id, old=None, new=None):
+    """
+    Move a task's contribution from the ``old`` buckets to the ``new`` ones.
+    Pass ``old=None`` for a created task and ``new=None`` for a deleted one.
+    """
+    record_many([(user_id, old, new)])
+
+
+def record_many(changes):
+    """``record`` for a batch of ``(user_id, old, new)``, with one round of updates per user."""
+    deltas = {}
+    for user_id, old, new in changes:
+        delta = deltas.setdefault(user_id, Counter())
+        delta.update(new or [])
+        delta.subtract(old or [])
+    for user_id, delta in deltas.items():
+        apply_delta(user_id, delta)
+
+
+def reassign_to_null(dimension, value):
+    """Hard-deleting a category/priority sets its tasks' FK to NULL; follow that in the counters."""
+    for counter in TaskCounter.objects.filter(dimension=dimension, value=_value(value)):
+        apply_delta(counter.user_id, {(dimension, "null"): counter.count})
+        counter.delete()
+
+
+def _stats_rows(user):
+    counters = TaskCounter.objects.filter(count__gt=0)
+    if user is not None:
+        counters = counters.filter(user=user)
+    return counters.values("dimension", "value").annotate(total=Sum("count")).order_by()
+
+
+def _shape_stats(rows):
+    data = {TOTAL: 0, **{dimension: {} for dimension in DIMENSIONS}}
+    for row in rows:
+        if row["dimension"] == TOTAL:
+            data[TOTAL] = row["total"]
+        elif row["dimension"] in data:
+            data[row["dimension"]][row["value"]] = row["total"]
+    return data
+
+
+def stats_for(user=None):
+    """Counters of ``user``, or summed over every user when ``user`` is None."""
+    return _shape_stats(_stats_rows(user))
+
+
+async def astats_for(user=None):
+    return _shape_stats([row async for row in _stats_rows(user)])
+
+
+def count_filtered(user_id, filters):
+    """
+    The user's live tasks matching ``filters`` (cleaned ``TaskFilter`` data), read
+    from the counters, or ``None`` if the filters are not a single counted dimension.
+    """
+    active = {name: value for name, value in filters.items() if value not in (None, "", [])}
+    if not active:
+        keys = [(TOTAL, "")]
+    elif len(active) > 1:
+        return None
+    else:
+        (name, value), = active.items()
+        if name == "status__in":
+            keys = [("status", _value(v)) for v in set(value)]
+        elif name in DIMENSIONS:
+            keys = [(name, _value(value))]
+        else:
+            return None
+    buckets = TaskCounter.objects.filter(reduce(or_, (Q(dimension=d, value=v) for d, v in keys)), user_id=user_id)
+    return buckets.aggregate(total=Sum("count"))["total"] or 0
+
+
+def compute_counts(user_ids=None):
+    """Count live tasks straight from the tasks table: {user_id: Counter({(dimension, value): n})}."""
+    tasks = Task.objects.all()
+    if user_ids is not None:
+        tasks = tasks.filter(created_by_id__in=user_ids)
+
+    counts = {}
+    for dimension, field in [(TOTAL, None), *((d, d) for d in DIMENSIONS)]:
+        columns = ["created_by_id"] + ([field] if field else [])
+        for row in tasks.values(*columns).annotate(n=Count("id")).order_by():
+            value = _value(row[field]) if field else ""
+            counts.setdefault(row["created_by_id"], Counter())[(dimension, value)] = row["n"]
+    return counts
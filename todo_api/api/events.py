@@ -0,0 +1,207 @@
+"""
+Per-user change events, pushed to clients over Server-Sent Events.
+
+Writes call ``publish`` (``publish_tasks`` for task batches); the event goes out
+once the transaction commits, through the broker named by EVENTS_BACKEND:
+``LocalBroker`` hands it to the subscribers of this process, ``RedisBroker``
+relays it through Redis pub/sub so subscribers on every node receive it. When
+its Redis connection drops, ``RedisBroker`` reconnects with backoff and then
+sends its subscribers ``overflow``, since events published meanwhile are lost.
+
+Each connection buffers at most EVENTS_BUFFER_SIZE events. A client that falls
+further behind is sent a single ``overflow`` event and disconnected; it should
+catch up from ``/api/task/changes/`` and reconnect, as after any disconnect
+(events are not replayed). Streams also end after EVENTS_STREAM_SECONDS, since
+the server may not report a client that went away; EventSource reconnects.
+"""
+import asyncio
+import json
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+
+logger = logging.getLogger(__name__)
+
+# Queued in place of a slow subscriber's backlog.
+OVERFLOW = object()
+
+
+class Subscription:
+    """One connection's bounded buffer, filled on the event loop that serves it."""
+
+    def __init__(self, user_id, size):
+        self.user_id = user_id
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(size)
+        self.overflowed = False
+
+    def put(self, event):
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.overflowed = True
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(OVERFLOW)
+
+    async def get(self):
+        return await self.queue.get()
+
+
+class LocalBroker:
+    """Delivers events to the subscribers of this process."""
+
+    def __init__(self):
+        self._subscriptions = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, user_id):
+        subscription = Subscription(user_id, settings.EVENTS_BUFFER_SIZE)
+        with self._lock:
+            self._subscriptions.setdefault(user_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.user_id, set())
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                self._subscriptions.pop(subscription.user_id, None)
+
+    def connections(self, user_id):
+        with self._lock:
+            return len(self._subscriptions.get(user_id, ()))
+
+    def publish(self, user_id, event):
+        self.deliver(user_id, event)
+
+    def deliver(self, user_id, event):
+        """Queue ``event`` for the user's local subscribers; safe to call from any thread."""
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(user_id, ()))
+        self._queue(subscriptions, event)
+
+    def resync(self):
+        """Send every local subscriber ``overflow`` so their clients catch up and reconnect."""
+        with self._lock:
+            subscriptions = [s for group in self._subscriptions.values() for s in group]
+        self._queue(subscriptions, OVERFLOW)
+
+    def _queue(self, subscriptions, event):
+        for subscription in subscriptions:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.put, event)
+            except RuntimeError:
+                # The loop serving it has shut down.
+                self.unsubscribe(subscription)
+
+
+class RedisBroker(LocalBroker):
+    """
+    Publishes to the ``api-events:<user id>`` channel of EVENTS_REDIS_URL; a
+    listener thread, started with the first subscription, delivers what arrives
+    to this process's subscribers. The listener logs and retries failures,
+    waiting ``reconnect_delay`` seconds, doubled per failed attempt up to
+    ``reconnect_max_delay``.
+    """
+    channel_prefix = "api-events:"
+    reconnect_delay = 0.5
+    reconnect_max_delay = 30
+
+    def __init__(self):
+        import redis
+
+        super().__init__()
+        self.client = redis.Redis.from_url(settings.EVENTS_REDIS_URL)
+        self._listener = None
+
+    def subscribe(self, user_id):
+        with self._lock:
+            if self._listener is None:
+                self._listener = threading.Thread(target=self.listen, name="api-events", daemon=True)
+                self._listener.start()
+        return super().subscribe(user_id)
+
+    def publish(self, user_id, event):
+        self.client.publish(f"{self.channel_prefix}{user_id}", json.dumps(event))
+
+    def listen(self):
+        delay, lost = self.reconnect_delay, False
+        while True:
+            pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+            try:
+                pubsub.psubscribe(self.channel_prefix + "*")
+                if lost:
+                    logger.warning("Reconnected to the events Redis")
+                    self.resync()
+                delay, lost = self.reconnect_delay, False
+                for message in pubsub.listen():
+                    user_id = int(message["channel"].decode().removeprefix(self.channel_prefix))
+                    self.deliver(user_id, json.loads(message["data"]))
+                logger.error("Events Redis subscription ended, reconnecting in %.1fs", delay)
+            except Exception:
+                logger.exception("Events listener failed, reconnecting in %.1fs", delay)
+            finally:
+                try:
+                    pubsub.close()
+                except Exception:
+                    pass
+            lost = True
+            time.sleep(delay)
+            delay = min(delay * 2, self.reconnect_max_delay)
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                _broker = import_string(settings.EVENTS_BACKEND)()
+    return _broker
+
+
+def publish(user_id, kind, action, ids):
+    """Send ``{"type": kind, "action": action, "ids": ids}`` to ``user_id`` once the transaction commits."""
+    event = {"type": kind, "action": action, "ids": list(ids)}
+    transaction.on_commit(lambda: get_broker().publish(user_id, event))
+
+
+def publish_tasks(action, tasks):
+    """``publish`` a batch of tasks, one event per owner."""
+    ids = {}
+    for task in tasks:
+        ids.setdefault(task.created_by_id, []).append(task.pk)
+    for user_id, pks in ids.items():
+        publish(user_id, "task", action, pks)
+
+
+async def stream(user_id):
+    """The user's events as ``text/event-stream`` chunks, with a comment line every EVENTS_KEEPALIVE seconds."""
+    broker = get_broker()
+    subscription = broker.subscribe(user_id)
+    deadline = time.monotonic() + settings.EVENTS_STREAM_SECONDS
+    try:
+        yield f"retry: {settings.EVENTS_RETRY_MS}\n\n"
+        while (remaining := deadline - time.monotonic()) > 0:
+            try:
+                event = await asyncio.wait_for(subscription.get(), min(settings.EVENTS_KEEPALIVE, remaining))
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+            if event is OVERFLOW:
+                yield "event: overflow\ndata: {}\n\n"
+                return
+            yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+    finally:
+        broker.unsubscribe(subscription)
@@ -0,0 +1,33 @@
+import csv
+from itertools import islice
+
+from .renderers import dumps
+
+
+class _Echo:
+    """File-like object whose ``write`` hands the line back to ``csv.writer``'s caller."""
+
+    def write(self, value):
+        return value
+
+
+def ndjson_lines(rows):
+    for row in rows:
+        yield dumps(row).decode() + "\n"
+
+
+def csv_lines(rows, fields):
+    writer = csv.DictWriter(_Echo(), fieldnames=fields, extrasaction="ignore")
+    yield writer.writeheader()
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def batched(lines, size):
+    """Join ``size`` lines per chunk so the server is not flushing one row at a time."""
+    lines = iter(lines)
+    while True:
+        chunk = "".join(islice(lines, size))
+        if not chunk:
+            return
+        yield chunk
@@ -0,0 +1,144 @@
+"""
+Password hashers tuned from settings, and a bounded pool that runs them.
+
+``PBKDF2PasswordHasher`` and ``Argon2PasswordHasher`` keep Django's algorithm
+names, so hashes made by the stock hashers still verify; their work factors come
+from the PASSWORD_PBKDF2_* / PASSWORD_ARGON2_* settings, and since Django
+rehashes a password on a successful check whenever ``must_update`` says its
+parameters are stale, changing those settings (or the preferred hasher) upgrades
+each user the next time they log in.
+
+Hashing runs on a pool of PASSWORD_HASH_WORKERS threads with at most
+PASSWORD_HASH_QUEUE more requests waiting for one. A request arriving while the
+pool and queue are full gets a 503 with Retry-After straight away instead of
+waiting, so a login or signup burst holds at most workers + queue request
+threads of a process; keep that below the server's thread count. A password
+check (verify, then harden_runtime or the rehash on login) holds one slot
+throughout via ``hashing_slot``, so a correct login cannot be turned away
+halfway. ``HashingBusyMiddleware`` gives non-DRF views such as the admin login
+the same 503.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.contrib.auth import hashers
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.http import HttpResponse
+
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+
+class HashingBusy(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = "Too many password checks in progress, try again shortly."
+    default_code = "hashing_busy"
+    wait = 1
+
+
+_pool = None
+_slots = None
+_pool_lock = threading.Lock()
+_held = threading.local()
+
+
+def _executor():
+    global _pool, _slots
+    with _pool_lock:
+        if _pool is None:
+            workers = settings.PASSWORD_HASH_WORKERS
+            _pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hash")
+            _slots = threading.BoundedSemaphore(workers + settings.PASSWORD_HASH_QUEUE)
+        return _pool, _slots
+
+
+@receiver(setting_changed)
+def reset_pool(*, setting, **kwargs):
+    global _pool
+    if setting.startswith("PASSWORD_HASH_"):
+        with _pool_lock:
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            _pool = None
+
+
+@contextmanager
+def hashing_slot():
+    """
+    Hold one pool slot for the block, raising HashingBusy if none is free;
+    ``offload`` calls inside it (and nested ``hashing_slot`` blocks) share it.
+    """
+    if getattr(_held, "slot", False):
+        yield
+        return
+    _, slots = _executor()
+    if not slots.acquire(blocking=False):
+        raise HashingBusy()
+    _held.slot = True
+    try:
+        yield
+    finally:
+        _held.slot = False
+        slots.release()
+
+
+def offload(func, *args):
+    """Run ``func(*args)`` on the hashing pool and wait for it; raises HashingBusy if the queue is full."""
+    with hashing_slot():
+        pool, _ = _executor()
+        return pool.submit(func, *args).result()
+
+
+class HashingBusyMiddleware:
+    """Answers a HashingBusy escaping a non-DRF view (the admin login) with 503 and Retry-After."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        return self.get_response(request)
+
+    def process_exception(self, request, exception):
+        if not isinstance(exception, HashingBusy):
+            return None
+        response = HttpResponse(str(exception.detail), status=exception.status_code, content_type="text/plain; charset=utf-8")
+        response["Retry-After"] = str(exception.wait)
+        return response
+
+
+class PBKDF2PasswordHasher(hashers.PBKDF2PasswordHasher):
+    @property
+    def iterations(self):
+        return settings.PASSWORD_PBKDF2_ITERATIONS
+
+    def encode(self, password, salt, iterations=None):
+        # verify() goes through encode() too.
+        return offload(super().encode, password, salt, iterations)
+
+
+class Argon2PasswordHasher(hashers.Argon2PasswordHasher):
+    @property
+    def time_cost(self):
+        return settings.PASSWORD_ARGON2_TIME_COST
+
+    @property
+    def memory_cost(self):
+        return settings.PASSWORD_ARGON2_MEMORY_COST
+
+    @property
+    def parallelism(self):
+        return settings.PASSWORD_ARGON2_PARALLELISM
+
+    def encode(self, password, salt):
+        return offload(super().encode, password, salt)
+
+    def verify(self, password, encoded):
+        return offload(super().verify, password, encoded)
@@ -0,0 +1,115 @@
+"""
+Per-user cache of the small Category/Priority lookup tables.
+
+Each (model, user) has a version token; entries are stored under the current
+token, so a write only has to replace the token (``invalidate``) and stale
+entries simply expire. Reads always populate from the primary database so a
+lagging replica cannot be cached under a fresh version.
+"""
+import threading
+import uuid
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+
+_stats = Counter()
+_stats_lock = threading.Lock()
+
+
+def _count(event):
+    with _stats_lock:
+        _stats[event] += 1
+
+
+def stats():
+    """Hit/miss/invalidation counts of this process."""
+    with _stats_lock:
+        return {key: _stats[key] for key in ("hits", "misses", "invalidations")}
+
+
+def _cache():
+    return caches[getattr(settings, "LOOKUP_CACHE", "default")]
+
+
+def _version_key(model, user_id):
+    return f"lookup-version:{model._meta.label_lower}:{user_id}"
+
+
+def _version(model, user_id):
+    cache = _cache()
+    version = cache.get(_version_key(model, user_id))
+    if version is None:
+        version = uuid.uuid4().hex
+        if not cache.add(_version_key(model, user_id), version, None):
+            version = cache.get(_version_key(model, user_id))
+    return version
+
+
+def rows_for(model, user_id):
+    """The user's live ``model`` rows in primary-key order."""
+    key = f"lookup:{model._meta.label_lower}:{user_id}:{_version(model, user_id)}"
+    rows = _cache().get(key)
+    if rows is not None:
+        _count("hits")
+        return rows
+    _count("misses")
+    rows = list(model.objects.using("default").filter(created_by_id=user_id).order_by("pk"))
+    _cache().set(key, rows, getattr(settings, "LOOKUP_CACHE_TIMEOUT", 300))
+    return rows
+
+
+def ids_for(model, user_id):
+    return {row.pk for row in rows_for(model, user_id)}
+
+
+def invalidate(model, user_id):
+    """Retire the cached set once the current transaction commits."""
+    def bump():
+        _count("invalidations")
+        _cache().set(_version_key(model, user_id), uuid.uuid4().hex, None)
+    transaction.on_commit(bump)
+
+
+def _sorted(rows, ordering):
+    for field in reversed(ordering):
+        rows = sorted(rows, key=lambda row: getattr(row, field.lstrip("-")), reverse=field.startswith("-"))
+    return rows
+
+
+class LookupCacheMixin:
+    """
+    Serve a non-staff user's list from the lookup cache when the whole set fits on
+    one page and neither ``?search=`` nor ``?cursor=`` is given. Expects
+    ``ConditionalGetMixin`` further down the MRO for the validators; the viewset
+    must call ``invalidate`` from its write hooks.
+    """
+
+    def list(self, request, *args, **kwargs):
+        paginator = self.paginator
+        if (
+            request.user.is_staff or paginator is None
+            or request.query_params.get(paginator.cursor_query_param)
+            or request.query_params.get(api_settings.SEARCH_PARAM)
+        ):
+            return super().list(request, *args, **kwargs)
+
+        model = self.get_queryset().model
+        version = _version(model, request.user.pk)
+        rows = rows_for(model, request.user.pk)
+        if len(rows) > paginator.get_page_size(request):
+            return super().list(request, *args, **kwargs)
+
+        etag = self.list_etag(version)
+        last_modified = max((row.updated_at for row in rows), default=None)
+        if self.is_not_modified(etag, last_modified):
+            return self.not_modified(etag, last_modified)
+
+        rows = _sorted(rows, paginator.get_ordering(request, self.get_queryset(), self))
+        data = {"next": None, "previous": None, "results": self.get_serializer(rows, many=True).data}
+        return self.with_validators(Response(data), etag, last_modified)
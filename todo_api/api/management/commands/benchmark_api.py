@@ -0,0 +1,156 @@
+import json
+import random
+import statistics
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test import Client
+from django.test.utils import override_settings
+
+from rest_framework.authtoken.models import Token
+
+from api.models import Category, Priority, Task
+from api.responsecache import RESPONSE_CACHE
+
+
+# name -> (method, path); "token" posts the generated users' credentials.
+ROUTES = {
+    "task-list": ("get", "/api/task/"),
+    "category-list": ("get", "/api/categories/"),
+    "users-me": ("get", "/api/users/me/"),
+    "token": ("post", "/api/token/"),
+}
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the API routes in-process, through the full middleware and URL stack, "
+        "against the current database (see generate_data). Requests rotate over a sample "
+        "of the generated users. Prints a JSON report with p50/p99 latency, throughput and "
+        "queries per request for each route; --compare prints the change against an "
+        "earlier report. Rate limits are lifted for the run unless --throttle is given."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--route", choices=list(ROUTES), action="append", dest="routes", help="Only run this route (repeatable).")
+        parser.add_argument("--requests", type=int, default=200, help="Measured requests per route.")
+        parser.add_argument("--warmup", type=int, default=10, help="Unmeasured requests per route before timing.")
+        parser.add_argument("--users", type=int, default=20, help="How many generated users to rotate over.")
+        parser.add_argument("--prefix", default="load-", help="Username prefix of the generated users.")
+        parser.add_argument("--password", default="load-password")
+        parser.add_argument("--host", default="localhost", help="Host header; must be in ALLOWED_HOSTS.")
+        parser.add_argument("--cold", action="store_true", help="Clear the response cache before every request.")
+        parser.add_argument("--throttle", action="store_true", help="Keep the configured rate limits.")
+        parser.add_argument("--seed", type=int, default=None)
+        parser.add_argument("--output", help="Write the report to this file instead of stdout.")
+        parser.add_argument("--compare", help="An earlier report to diff against.")
+
+    def handle(self, *args, **options):
+        if options["requests"] < 1 or options["users"] < 1:
+            raise CommandError("--requests and --users must be >= 1")
+        users = list(User.objects.filter(username__startswith=options["prefix"]).order_by("pk"))
+        if not users:
+            raise CommandError(f"No users named {options['prefix']}*; run generate_data first.")
+        users = random.Random(options["seed"]).sample(users, min(options["users"], len(users)))
+        self.tokens = [Token.objects.get_or_create(user=user)[0].key for user in users]
+        self.usernames = [user.username for user in users]
+        self.client = Client(HTTP_HOST=options["host"])
+
+        rest_framework = settings.REST_FRAMEWORK
+        if not options["throttle"]:
+            rest_framework = {**rest_framework, "DEFAULT_THROTTLE_RATES": {}}
+        with override_settings(REST_FRAMEWORK=rest_framework):
+            routes = {name: self.run(name, options) for name in options["routes"] or ROUTES}
+
+        report = {
+            "dataset": {
+                "users": User.objects.count(),
+                "tasks": Task.objects.count(),
+                "categories": Category.objects.count(),
+                "priorities": Priority.objects.count(),
+            },
+            "run": {key: options[key] for key in ("requests", "warmup", "users", "cold", "throttle")} | {"database": connection.vendor},
+            "routes": routes,
+        }
+        output = json.dumps(report, indent=2)
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                f.write(output + "\n")
+        else:
+            self.stdout.write(output)
+        if options["compare"]:
+            self.compare(report, options["compare"])
+
+    def request(self, name, i, options):
+        method, path = ROUTES[name]
+        if options["cold"]:
+            caches[RESPONSE_CACHE].clear()
+        user = i % len(self.tokens)
+        if name == "token":
+            return self.client.post(path, {"username": self.usernames[user], "password": options["password"]})
+        return getattr(self.client, method)(path, HTTP_AUTHORIZATION=f"Token {self.tokens[user]}")
+
+    def run(self, name, options):
+        for i in range(options["warmup"]):
+            self.request(name, i, options)
+
+        queries = 0
+
+        def count(execute, sql, params, many, context):
+            nonlocal queries
+            queries += 1
+            return execute(sql, params, many, context)
+
+        latencies, query_counts, statuses = [], [], Counter()
+        started = time.perf_counter()
+        for i in range(options["requests"]):
+            queries = 0
+            with ExitStack() as stack:
+                for conn in connections.all():
+                    stack.enter_context(conn.execute_wrapper(count))
+                start = time.perf_counter()
+                response = self.request(name, i, options)
+                latencies.append(time.perf_counter() - start)
+            query_counts.append(queries)
+            statuses[str(response.status_code)] += 1
+        elapsed = time.perf_counter() - started
+
+        result = {
+            "p50_ms": round(statistics.median(latencies) * 1000, 3),
+            "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+            "mean_ms": round(statistics.fmean(latencies) * 1000, 3),
+            "throughput": round(len(latencies) / elapsed, 1),
+            "queries_p50": statistics.median(query_counts),
+            "queries_max": max(query_counts),
+            "statuses": dict(statuses),
+        }
+        self.stderr.write(
+            f"{name:<14} p50 {result['p50_ms']:8.2f} ms  p99 {result['p99_ms']:8.2f} ms  "
+            f"{result['throughput']:8.1f} req/s  {result['queries_p50']} queries  {dict(statuses)}"
+        )
+        return result
+
+    def compare(self, report, path):
+        with open(path) as f:
+            baseline = json.load(f)["routes"]
+        for name, result in report["routes"].items():
+            if name not in baseline:
+                continue
+            before = baseline[name]
+            changes = []
+            for key in ("p50_ms", "p99_ms", "throughput"):
+                if before[key]:
+                    changes.append(f"{key} {(result[key] - before[key]) / before[key]:+.1%}")
+            changes.append(f"queries {result['queries_p50'] - before['queries_p50']:+g}")
+            self.stderr.write(f"{name:<14} " + "  ".join(changes))
@@ -0,0 +1,128 @@
+import math
+import random
+from datetime import timedelta
+from io import StringIO
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from api.models import Category, Priority, Task
+
+
+STATUSES = ["new", "in_progress", "completed"]
+STATUS_WEIGHTS = [5, 2, 3]
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate a synthetic dataset shaped like production: users whose task, category "
+        "and priority counts follow a log-normal distribution (a few heavy users, a long "
+        "tail of light ones), with a fraction of every table soft-deleted. Rows are written "
+        "with bulk inserts and the task counters are rebuilt at the end. Every generated "
+        "user has --password, so benchmark_api can also exercise /api/token/."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=100)
+        parser.add_argument("--tasks", type=float, default=200, help="Mean tasks per user.")
+        parser.add_argument("--categories", type=float, default=8, help="Mean categories per user.")
+        parser.add_argument("--priorities", type=float, default=4, help="Mean priorities per user.")
+        parser.add_argument("--skew", type=float, default=1.0, help="Sigma of the log-normal per-user counts; 0 gives every user the mean.")
+        parser.add_argument("--deleted", type=float, default=0.05, help="Fraction of rows to soft-delete.")
+        parser.add_argument("--days", type=int, default=60, help="Spread deleted_at/completed_at over this many past days.")
+        parser.add_argument("--prefix", default="load-", help="Username prefix of the generated users.")
+        parser.add_argument("--password", default="load-password")
+        parser.add_argument("--seed", type=int, default=None, help="Seed for a reproducible dataset.")
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument("--flush", action="store_true", help="Delete earlier users with --prefix (and their rows) first.")
+
+    def handle(self, *args, **options):
+        if options["users"] < 1 or options["batch_size"] < 1 or not 0 <= options["deleted"] <= 1:
+            raise CommandError("--users and --batch-size must be >= 1 and --deleted within [0, 1]")
+        self.random = random.Random(options["seed"])
+        self.options = options
+        self.now = timezone.now()
+
+        existing = User.objects.filter(username__startswith=options["prefix"])
+        if options["flush"]:
+            existing.delete()
+        elif existing.exists():
+            raise CommandError(f"Users named {options['prefix']}* already exist; pass --flush to replace them.")
+
+        password = make_password(options["password"])
+        User.objects.bulk_create(
+            (User(username=f"{options['prefix']}{i:06d}", password=password) for i in range(options["users"])),
+            batch_size=options["batch_size"],
+        )
+        user_ids = list(User.objects.filter(username__startswith=options["prefix"]).values_list("pk", flat=True))
+
+        with transaction.atomic():
+            self.insert(Category, (
+                Category(created_by_id=user_id, name=f"Category {j}", **self.deletion())
+                for user_id in user_ids for j in range(self.count(options["categories"]))
+            ))
+            self.insert(Priority, (
+                Priority(created_by_id=user_id, name=f"Priority {j}", **self.deletion())
+                for user_id in user_ids for j in range(self.count(options["priorities"]))
+            ))
+        categories = self.ids_by_owner(Category)
+        priorities = self.ids_by_owner(Priority)
+
+        tasks = self.insert(Task, (
+            self.task(user_id, n, categories.get(user_id, []), priorities.get(user_id, []))
+            for user_id in user_ids for n in range(self.count(options["tasks"]))
+        ))
+        call_command("rebuild_task_counters", stdout=StringIO())
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Generated {len(user_ids)} users, {tasks} tasks, "
+            f"{sum(map(len, categories.values()))} categories and {sum(map(len, priorities.values()))} priorities."
+        ))
+
+    def count(self, mean):
+        """A log-normal draw with the given mean, so the heaviest users hold a large share of the rows."""
+        sigma = self.options["skew"]
+        if mean <= 0:
+            return 0
+        return round(self.random.lognormvariate(math.log(mean) - sigma ** 2 / 2, sigma))
+
+    def deletion(self):
+        if self.random.random() >= self.options["deleted"]:
+            return {}
+        return {"deleted": True, "deleted_at": self.past()}
+
+    def past(self):
+        return self.now - timedelta(seconds=self.random.uniform(0, self.options["days"] * 86400))
+
+    def task(self, user_id, n, categories, priorities):
+        status = self.random.choices(STATUSES, STATUS_WEIGHTS)[0]
+        # About a fifth of the tasks are left uncategorized / without a priority.
+        category = self.random.choice(categories) if categories and self.random.random() < 0.8 else None
+        priority = self.random.choice(priorities) if priorities and self.random.random() < 0.8 else None
+        return Task(
+            created_by_id=user_id, title=f"Task {n}", description="Lorem ipsum dolor sit amet. " * self.random.randint(0, 8),
+            status=status, completed=status == "completed", completed_at=self.past() if status == "completed" else None,
+            category_id=category, priority_id=priority, **self.deletion(),
+        )
+
+    def insert(self, model, objs):
+        """Bulk insert ``objs`` in --batch-size chunks without materializing them all; returns the row count."""
+        objs, total = iter(objs), 0
+        while batch := list(islice(objs, self.options["batch_size"])):
+            model.all_objects.bulk_create(batch)
+            total += len(batch)
+            self.stderr.write(f"{model._meta.verbose_name_plural}: {total}")
+        return total
+
+    def ids_by_owner(self, model):
+        """Live row ids per generated owner, read back since not every backend returns bulk-inserted keys."""
+        ids = {}
+        rows = model.objects.filter(created_by__username__startswith=self.options["prefix"]).values_list("created_by_id", "pk")
+        for user_id, pk in rows.iterator():
+            ids.setdefault(user_id, []).append(pk)
+        return ids
@@ -0,0 +1,103 @@
+import json
+import os
+import subprocess
+import sys
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+# What a worker does before serving its first request.
+BOOT = (
+    "import django; django.setup(); "
+    "from django.core.wsgi import get_wsgi_application; get_wsgi_application(); "
+    "from django.urls import get_resolver; get_resolver().url_patterns"
+)
+
+
+def parse_importtime(output):
+    """``[(module, self µs, cumulative µs, depth)]`` from ``python -X importtime`` stderr."""
+    modules = []
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        depth = (len(name) - len(name.lstrip())) // 2
+        modules.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return modules
+
+
+class Command(BaseCommand):
+    help = (
+        "Boot the project in a fresh interpreter under `python -X importtime` (settings, "
+        "app registry, WSGI handler, URLconf) and report the wall time, the total import "
+        "time, the packages that account for it and the slowest top-level imports as JSON. "
+        "Keep the report per release and pass it to --compare to see what changed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--runs", type=int, default=3, help="Boots to run; the median one is reported.")
+        parser.add_argument("--top", type=int, default=15, help="Packages and imports to list.")
+        parser.add_argument("--output", help="Write the report to this file instead of stdout.")
+        parser.add_argument("--compare", help="An earlier report to diff against.")
+
+    def handle(self, *args, **options):
+        if options["runs"] < 1:
+            raise CommandError("--runs must be >= 1")
+        reports = sorted((self.boot(options) for _ in range(options["runs"])), key=lambda r: r["import_ms"])
+        report = reports[len(reports) // 2]
+        report["wall_ms_runs"] = [r["wall_ms"] for r in reports]
+
+        output = json.dumps(report, indent=2)
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                f.write(output + "\n")
+        else:
+            self.stdout.write(output)
+        if options["compare"]:
+            self.compare(report, options["compare"])
+
+    def boot(self, options):
+        env = {**os.environ, "DJANGO_SETTINGS_MODULE": settings.SETTINGS_MODULE}
+        start = time.perf_counter()
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", BOOT],
+            cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+        )
+        wall = time.perf_counter() - start
+        modules = parse_importtime(result.stderr)
+        if result.returncode or not modules:
+            raise CommandError(f"Boot failed:\n{result.stderr[-2000:]}")
+
+        packages = Counter()
+        for name, self_us, _, _ in modules:
+            packages[name.split(".")[0]] += self_us
+        total = sum(packages.values())
+        roots = sorted((m for m in modules if m[3] == 0), key=lambda m: m[2], reverse=True)
+        return {
+            "python": sys.version.split()[0],
+            "settings": settings.SETTINGS_MODULE,
+            "wall_ms": round(wall * 1000, 1),
+            "import_ms": round(total / 1000, 1),
+            "modules": len(modules),
+            "packages": [
+                {"name": name, "self_ms": round(us / 1000, 1), "share": round(us / total, 3)}
+                for name, us in packages.most_common(options["top"])
+            ],
+            "slowest": [{"module": name, "cumulative_ms": round(us / 1000, 1)} for name, _, us, _ in roots[:options["top"]]],
+        }
+
+    def compare(self, report, path):
+        with open(path) as f:
+            baseline = json.load(f)
+        self.stderr.write(
+            f"wall {report['wall_ms'] - baseline['wall_ms']:+.1f} ms  "
+            f"imports {report['import_ms'] - baseline['import_ms']:+.1f} ms  "
+            f"modules {report['modules'] - baseline['modules']:+d}"
+        )
+        before = {p["name"]: p["self_ms"] for p in baseline["packages"]}
+        after = {p["name"]: p["self_ms"] for p in report["packages"]}
+        for name in sorted(set(before) | set(after), key=lambda n: -abs(after.get(n, 0) - before.get(n, 0))):
+            self.stderr.write(f"  {name:<24} {before.get(name, 0):8.1f} -> {after.get(name, 0):8.1f} ms")
@@ -0,0 +1,82 @@
+import json
+import statistics
+import time
+import urllib.error
+import urllib.request
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+PATHS = ["task/", "task/stats/", "categories/"]
+
+
+class Command(BaseCommand):
+    help = (
+        "Drive the sync (/api/...) and async (/api/async/...) read endpoints of a running "
+        "server with concurrent requests and compare latency and throughput. Run the "
+        "server under WSGI and ASGI (e.g. gunicorn vs uvicorn) and point --base-url at each. "
+        "Throughput counts 2xx responses only. Raise the throttle rates on the server under "
+        "test (THROTTLE_RATE_CHEAP, THROTTLE_RATE_EXPENSIVE) or most requests come back 429."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--base-url", required=True, help="Server root, e.g. http://127.0.0.1:8000")
+        parser.add_argument("--token", required=True, help="API token to authenticate with.")
+        parser.add_argument("--path", action="append", dest="paths", help=f"Path under /api/ (repeatable, default {PATHS}).")
+        parser.add_argument("--concurrency", type=int, default=50)
+        parser.add_argument("--requests", type=int, default=1000, help="Requests per path and mode.")
+        parser.add_argument("--timeout", type=float, default=30)
+
+    def handle(self, *args, **options):
+        base = options["base_url"].rstrip("/")
+        report = []
+        for path in options["paths"] or PATHS:
+            for mode, prefix in [("sync", "/api/"), ("async", "/api/async/")]:
+                result = self.run(base + prefix + path, options)
+                report.append({"path": path, "mode": mode, **result})
+                self.stderr.write(
+                    f"{mode:>5} {path:<20} {result['throughput']:8.1f} req/s  "
+                    f"p50 {result['p50_ms']:7.1f} ms  p99 {result['p99_ms']:7.1f} ms  "
+                    + "  ".join(f"{status}: {n}" for status, n in sorted(result["statuses"].items()))
+                )
+        self.stdout.write(json.dumps(report, indent=2))
+
+    def run(self, url, options):
+        headers = {"Authorization": f"Token {options['token']}", "Accept": "application/json"}
+
+        def fetch(_):
+            start = time.perf_counter()
+            try:
+                with urllib.request.urlopen(urllib.request.Request(url, headers=headers), timeout=options["timeout"]) as r:
+                    r.read()
+                    status = str(r.status)
+            except urllib.error.HTTPError as exc:
+                status = str(exc.code)
+            except (urllib.error.URLError, OSError):
+                status = "error"
+            return time.perf_counter() - start, status
+
+        try:
+            fetch(None)
+        except ValueError as exc:
+            raise CommandError(exc)
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options["concurrency"]) as pool:
+            results = list(pool.map(fetch, range(options["requests"])))
+        elapsed = time.perf_counter() - start
+
+        # Only successful responses count: a throttled 429 is cheap and would
+        # otherwise inflate the throughput.
+        statuses = dict(Counter(status for _, status in results))
+        latencies = sorted(latency for latency, status in results if status.startswith("2"))
+        if not latencies:
+            return {"throughput": 0.0, "p50_ms": 0.0, "p99_ms": 0.0, "statuses": statuses}
+        return {
+            "throughput": len(latencies) / elapsed,
+            "p50_ms": statistics.median(latencies) * 1000,
+            "p99_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000,
+            "statuses": statuses,
+        }
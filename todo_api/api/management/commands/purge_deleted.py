@@ -0,0 +1,90 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core import serializers
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from api import counters, responsecache
+from api.models import ArchivedRecord, Category, Priority, Task
+
+
+# Tasks go first so fewer rows point at the categories/priorities purged after them.
+MODELS = {"task": Task, "category": Category, "priority": Priority}
+
+
+class Command(BaseCommand):
+    help = (
+        "Hard-delete (or, with --archive, move to ArchivedRecord) soft-deleted tasks, "
+        "categories and priorities whose deleted_at is older than the retention window. "
+        "Works in short batches, one transaction each, pausing --sleep seconds between "
+        "them; safe to run from cron while the API is serving."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days", type=int, default=None,
+            help="Retention window in days (default SOFT_DELETE_RETENTION_DAYS).",
+        )
+        parser.add_argument("--model", choices=list(MODELS), action="append", dest="models", help="Only purge this model (repeatable).")
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument("--sleep", type=float, default=0.1, help="Seconds to pause between batches.")
+        parser.add_argument("--archive", action="store_true", help="Copy each row to ArchivedRecord before deleting it.")
+        parser.add_argument("--dry-run", action="store_true", help="Only count the rows that would be purged.")
+
+    def handle(self, *args, **options):
+        days = options["days"] if options["days"] is not None else settings.SOFT_DELETE_RETENTION_DAYS
+        if days < 0 or options["batch_size"] < 1:
+            raise CommandError("--days must be >= 0 and --batch-size >= 1")
+        cutoff = timezone.now() - timedelta(days=days)
+
+        reclaimed = {}
+        for name in options["models"] or MODELS:
+            model = MODELS[name]
+            expired = model.all_objects.filter(deleted=True, deleted_at__lt=cutoff)
+            if options["dry_run"]:
+                reclaimed[name] = expired.count()
+                continue
+
+            reclaimed[name] = 0
+            while True:
+                with transaction.atomic():
+                    purged = self.purge_batch(name, model, expired, options)
+                if not purged:
+                    break
+                reclaimed[name] += purged
+                self.stderr.write(f"{name}: {reclaimed[name]} row(s) purged")
+                if purged < options["batch_size"]:
+                    break
+                time.sleep(options["sleep"])
+
+        verb = "would be purged" if options["dry_run"] else ("archived" if options["archive"] else "purged")
+        summary = ", ".join(f"{name}={count}" for name, count in reclaimed.items())
+        self.stdout.write(self.style.SUCCESS(f"Rows deleted before {cutoff.isoformat()} {verb}: {summary}."))
+
+    def purge_batch(self, name, model, expired, options):
+        batch = expired.order_by("deleted_at", "pk")[:options["batch_size"]]
+        if options["archive"]:
+            rows = list(batch)
+            ids = [row.pk for row in rows]
+            ArchivedRecord.objects.bulk_create(
+                ArchivedRecord(model=model._meta.label_lower, object_id=item["pk"], data=item["fields"], deleted_at=row.deleted_at)
+                for row, item in zip(rows, serializers.serialize("python", rows))
+            )
+        else:
+            ids = list(batch.values_list("pk", flat=True))
+        if not ids:
+            return 0
+
+        if model is not Task:
+            # Do the FK's SET_NULL ourselves so delta sync sees the tasks change, and
+            # move their counts to the "null" bucket as a staff hard delete does.
+            tasks = Task.all_objects.filter(**{f"{name}_id__in": ids})
+            responsecache.bump(*set(tasks.values_list("created_by_id", flat=True)))
+            tasks.update(**{name: None, "updated_at": timezone.now()})
+            for pk in ids:
+                counters.reassign_to_null(name, pk)
+        model.all_objects.filter(pk__in=ids).delete()
+        return len(ids)
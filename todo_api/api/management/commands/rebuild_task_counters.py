@@ -0,0 +1,46 @@
+from collections import Counter
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from api.counters import compute_counts
+from api.models import TaskCounter
+
+
+class Command(BaseCommand):
+    help = "Recount per-user task counters from the tasks table and report drift."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", type=int, action="append", dest="users", help="Only rebuild this user id (repeatable).")
+        parser.add_argument("--dry-run", action="store_true", help="Report drift without rewriting the counters.")
+
+    def handle(self, *args, **options):
+        users = options["users"]
+        expected = compute_counts(users)
+
+        stored = TaskCounter.objects.all()
+        if users:
+            stored = stored.filter(user_id__in=users)
+        actual = {}
+        for counter in stored:
+            actual.setdefault(counter.user_id, Counter())[(counter.dimension, counter.value)] = counter.count
+
+        drifted = 0
+        for user_id in sorted(set(expected) | set(actual)):
+            want, have = expected.get(user_id, Counter()), actual.get(user_id, Counter())
+            for key in sorted(set(want) | set(have)):
+                if want[key] != have[key]:
+                    drifted += 1
+                    self.stdout.write(f"user {user_id} {key[0]}={key[1]}: stored {have[key]}, actual {want[key]}")
+
+        if not options["dry_run"]:
+            with transaction.atomic():
+                stored.delete()
+                TaskCounter.objects.bulk_create(
+                    TaskCounter(user_id=user_id, dimension=dimension, value=value, count=count)
+                    for user_id, counts in expected.items()
+                    for (dimension, value), count in counts.items()
+                )
+
+        action = "found" if options["dry_run"] else "fixed"
+        self.stdout.write(self.style.SUCCESS(f"{drifted} drifted counter(s) {action} across {len(expected)} user(s)."))
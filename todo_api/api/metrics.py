@@ -0,0 +1,222 @@
+"""
+Per-route request metrics in the Prometheus text format, served at ``/metrics``.
+
+``MetricsMiddleware`` times every request and labels it by viewset action
+(``TaskViewSet.list``, ``UserViewSet.me``, ...) or URL name. Database time and
+query counts come from ``record_queries``, an execute wrapper installed on each
+connection as it opens, so replica aliases and the thread async ORM calls run in
+are covered too. Serializers that include ``SerializerTimingMixin`` add the time
+spent building ``.data``.
+
+Series live in process memory: every worker exposes its own, as with any
+multi-process Prometheus target.
+"""
+import bisect
+import logging
+import threading
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.crypto import constant_time_compare
+
+from . import lookups, responsecache
+
+
+logger = logging.getLogger("api.slow_requests")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 25, 50, 100)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+HISTOGRAMS = {
+    "api_request_duration_seconds": ("Time to produce a response.", LATENCY_BUCKETS),
+    "api_request_db_queries": ("Database queries per request.", QUERY_BUCKETS),
+    "api_request_db_seconds": ("Time spent in database queries per request.", LATENCY_BUCKETS),
+    "api_request_serializer_seconds": ("Time spent building serializer data per request.", LATENCY_BUCKETS),
+    "api_response_size_bytes": ("Size of non-streaming response bodies.", SIZE_BUCKETS),
+}
+
+# Statements kept per request for the slow-request log.
+SLOW_SQL_LIMIT = 200
+
+_lock = threading.Lock()
+# (metric name, labels) -> [per-bucket counts..., +Inf count, sum]
+_series = {}
+
+_current = ContextVar("request_metrics", default=None)
+
+
+class _Record:
+    __slots__ = ("queries", "db_seconds", "serializer_seconds", "sql")
+
+    def __init__(self, capture_sql):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.serializer_seconds = 0.0
+        self.sql = [] if capture_sql else None
+
+
+def observe(name, labels, value):
+    buckets = HISTOGRAMS[name][1]
+    key = (name, labels)
+    with _lock:
+        series = _series.get(key)
+        if series is None:
+            series = _series[key] = [0] * (len(buckets) + 1) + [0.0]
+        series[bisect.bisect_left(buckets, value)] += 1
+        series[-1] += value
+
+
+def reset():
+    with _lock:
+        _series.clear()
+
+
+def record_queries(execute, sql, params, many, context):
+    """Execute wrapper: charge the query to the request being measured, if any."""
+    record = _current.get()
+    if record is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = time.perf_counter() - start
+        record.queries += 1
+        record.db_seconds += elapsed
+        if record.sql is not None and len(record.sql) < SLOW_SQL_LIMIT:
+            record.sql.append((round(elapsed * 1000, 3), sql))
+
+
+def install_query_wrapper(sender, connection, **kwargs):
+    """``connection_created`` receiver."""
+    if record_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_queries)
+
+
+def add_serializer_time(seconds):
+    record = _current.get()
+    if record is not None:
+        record.serializer_seconds += seconds
+
+
+class SerializerTimingMixin:
+    """Adds the time spent building ``.data`` to the current request's serializer time."""
+
+    @property
+    def data(self):
+        if _current.get() is None:
+            return super().data
+        start = time.perf_counter()
+        try:
+            return super().data
+        finally:
+            add_serializer_time(time.perf_counter() - start)
+
+
+def route_label(request):
+    match = getattr(request, "resolver_match", None)
+    if match is None:
+        return "unmatched"
+    cls = getattr(match.func, "cls", None)
+    if cls is None:
+        return match.view_name or match.func.__name__
+    method = request.method.lower()
+    actions = getattr(match.func, "actions", None) or {}
+    return f"{cls.__name__}.{actions.get(method, method)}"
+
+
+class MetricsMiddleware:
+    """Records the ``HISTOGRAMS`` for each request and logs outliers' SQL when SLOW_REQUEST_SECONDS is set."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        record, token, start = self.begin()
+        response = self.get_response(request)
+        return self.end(request, response, record, token, start)
+
+    async def __acall__(self, request):
+        record, token, start = self.begin()
+        response = await self.get_response(request)
+        return self.end(request, response, record, token, start)
+
+    def begin(self):
+        record = _Record(capture_sql=getattr(settings, "SLOW_REQUEST_SECONDS", None) is not None)
+        return record, _current.set(record), time.perf_counter()
+
+    def end(self, request, response, record, token, start):
+        elapsed = time.perf_counter() - start
+        _current.reset(token)
+        route = route_label(request)
+        labels = (("route", route), ("method", request.method), ("status", str(response.status_code)))
+        observe("api_request_duration_seconds", labels, elapsed)
+        observe("api_request_db_queries", (("route", route),), record.queries)
+        observe("api_request_db_seconds", (("route", route),), record.db_seconds)
+        observe("api_request_serializer_seconds", (("route", route),), record.serializer_seconds)
+        if not response.streaming:
+            observe("api_response_size_bytes", (("route", route),), len(response.content))
+
+        threshold = getattr(settings, "SLOW_REQUEST_SECONDS", None)
+        if threshold is not None and record.sql is not None and elapsed >= threshold:
+            logger.warning(
+                "Slow request %s %s (%s): %.1f ms, %d queries in %.1f ms\n%s",
+                request.method, request.get_full_path(), route, elapsed * 1000,
+                record.queries, record.db_seconds * 1000,
+                "\n".join(f"  [{ms} ms] {sql}" for ms, sql in record.sql),
+            )
+        return response
+
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels, extra=()):
+    pairs = [*labels, *extra]
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}" if pairs else ""
+
+
+def render():
+    with _lock:
+        series = sorted((key, list(values)) for key, values in _series.items())
+    lines = []
+    for name, (help_text, buckets) in HISTOGRAMS.items():
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+        for (series_name, labels), values in series:
+            if series_name != name:
+                continue
+            cumulative = 0
+            for bound, count in zip((*buckets, "+Inf"), values):
+                cumulative += count
+                lines.append(f"{name}_bucket{_labels(labels, [('le', str(bound))])} {cumulative}")
+            lines.append(f"{name}_sum{_labels(labels)} {values[-1]}")
+            lines.append(f"{name}_count{_labels(labels)} {cumulative}")
+    lines += ["# HELP api_lookup_cache_events_total Category/Priority lookup cache events.",
+              "# TYPE api_lookup_cache_events_total counter"]
+    for event, count in lookups.stats().items():
+        lines.append(f'api_lookup_cache_events_total{{event="{event}"}} {count}')
+    lines += ["# HELP api_response_cache_events_total Per-user list/retrieve response cache events.",
+              "# TYPE api_response_cache_events_total counter"]
+    for event, count in responsecache.stats().items():
+        lines.append(f'api_response_cache_events_total{{event="{event}"}} {count}')
+    return "\n".join(lines) + "\n"
+
+
+def metrics_view(request):
+    """Prometheus scrape target; requires ``Authorization: Bearer <METRICS_TOKEN>`` when that is set."""
+    token = getattr(settings, "METRICS_TOKEN", None)
+    if token and not constant_time_compare(request.headers.get("Authorization", ""), f"Bearer {token}"):
+        return HttpResponse(status=403)
+    return HttpResponse(render(), content_type="text/plain; version=0.0.4; charset=utf-8")
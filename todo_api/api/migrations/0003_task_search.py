@@ -0,0 +1,79 @@
+from django.db import migrations
+
+
+# Postgres keeps the document in a stored generated column, so every INSERT/UPDATE
+# of a task refreshes it without application code.
+POSTGRES_FORWARD = [
+    """
+    ALTER TABLE "api_task" ADD COLUMN "search_vector" tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('english'::regconfig, coalesce("title", '')), 'A') ||
+        setweight(to_tsvector('english'::regconfig, coalesce("description", '')), 'B') ||
+        setweight(to_tsvector('simple'::regconfig, coalesce("status", '')), 'C')
+    ) STORED
+    """,
+    'CREATE INDEX "task_search_idx" ON "api_task" USING GIN ("search_vector") WHERE NOT "deleted"',
+]
+POSTGRES_BACKWARD = [
+    'DROP INDEX IF EXISTS "task_search_idx"',
+    'ALTER TABLE "api_task" DROP COLUMN IF EXISTS "search_vector"',
+]
+
+# SQLite uses an external-content FTS5 table kept in sync by triggers. Note that
+# SQLite rebuilds a table (dropping its triggers) on most ALTERs, so a later
+# migration touching api_task on SQLite has to recreate them.
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE "api_task_fts" USING fts5(
+        title, description, status, content='api_task', content_rowid='id', tokenize='porter unicode61'
+    )
+    """,
+    """
+    CREATE TRIGGER "api_task_fts_ai" AFTER INSERT ON "api_task" BEGIN
+        INSERT INTO api_task_fts(rowid, title, description, status)
+        VALUES (new.id, new.title, new.description, new.status);
+    END
+    """,
+    """
+    CREATE TRIGGER "api_task_fts_ad" AFTER DELETE ON "api_task" BEGIN
+        INSERT INTO api_task_fts(api_task_fts, rowid, title, description, status)
+        VALUES ('delete', old.id, old.title, old.description, old.status);
+    END
+    """,
+    """
+    CREATE TRIGGER "api_task_fts_au" AFTER UPDATE OF title, description, status ON "api_task" BEGIN
+        INSERT INTO api_task_fts(api_task_fts, rowid, title, description, status)
+        VALUES ('delete', old.id, old.title, old.description, old.status);
+        INSERT INTO api_task_fts(rowid, title, description, status)
+        VALUES (new.id, new.title, new.description, new.status);
+    END
+    """,
+    "INSERT INTO api_task_fts(api_task_fts) VALUES ('rebuild')",
+]
+SQLITE_BACKWARD = [
+    'DROP TRIGGER IF EXISTS "api_task_fts_au"',
+    'DROP TRIGGER IF EXISTS "api_task_fts_ad"',
+    'DROP TRIGGER IF EXISTS "api_task_fts_ai"',
+    'DROP TABLE IF EXISTS "api_task_fts"',
+]
+
+
+def run_for_vendor(postgres, sqlite):
+    def run(apps, schema_editor):
+        statements = {"postgresql": postgres, "sqlite": sqlite}.get(schema_editor.connection.vendor, [])
+        for sql in statements:
+            schema_editor.execute(sql)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_soft_delete_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run_for_vendor(POSTGRES_FORWARD, SQLITE_FORWARD),
+            run_for_vendor(POSTGRES_BACKWARD, SQLITE_BACKWARD),
+        ),
+    ]
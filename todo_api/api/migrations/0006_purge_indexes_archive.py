@@ -0,0 +1,41 @@
+# Generated by Django 4.2.30 on 2026-10-18 17:46
+
+import django.core.serializers.json
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_task_owner_updated_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedRecord',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(max_length=50)),
+                ('object_id', models.BigIntegerField()),
+                ('data', models.JSONField(encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ('deleted_at', models.DateTimeField(null=True)),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='category',
+            index=models.Index(condition=models.Q(('deleted', True)), fields=['deleted_at', 'id'], name='category_purge_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='priority',
+            index=models.Index(condition=models.Q(('deleted', True)), fields=['deleted_at', 'id'], name='priority_purge_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(condition=models.Q(('deleted', True)), fields=['deleted_at', 'id'], name='task_purge_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedrecord',
+            index=models.Index(fields=['model', 'object_id'], name='archive_object_idx'),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 4.2.30 on 2026-10-18 18:08
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('api', '0006_purge_indexes_archive'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaskFilterPreset',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('params', models.JSONField(default=dict)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(condition=models.Q(('deleted', False)), fields=['created_by', 'completed', 'created_at', 'id'], name='task_owner_completed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(condition=models.Q(('deleted', False)), fields=['created_by', 'completed_at', 'id'], name='task_owner_completed_at_idx'),
+        ),
+        migrations.AddField(
+            model_name='taskfilterpreset',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='task_filter_presets', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterUniqueTogether(
+            name='taskfilterpreset',
+            unique_together={('user', 'name')},
+        ),
+    ]
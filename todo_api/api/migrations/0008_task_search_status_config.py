@@ -0,0 +1,41 @@
+from django.db import migrations
+
+
+# 0003 indexed status with the 'simple' config while TaskSearchFilter queries with
+# 'english', so stemmed query terms ("completed" -> "complet") never matched it.
+# Rebuild the generated column with 'english' throughout; SQLite is unaffected.
+def search_vector(status_config):
+    return [
+        'DROP INDEX IF EXISTS "task_search_idx"',
+        'ALTER TABLE "api_task" DROP COLUMN IF EXISTS "search_vector"',
+        f"""
+        ALTER TABLE "api_task" ADD COLUMN "search_vector" tsvector GENERATED ALWAYS AS (
+            setweight(to_tsvector('english'::regconfig, coalesce("title", '')), 'A') ||
+            setweight(to_tsvector('english'::regconfig, coalesce("description", '')), 'B') ||
+            setweight(to_tsvector('{status_config}'::regconfig, coalesce("status", '')), 'C')
+        ) STORED
+        """,
+        'CREATE INDEX "task_search_idx" ON "api_task" USING GIN ("search_vector") WHERE NOT "deleted"',
+    ]
+
+
+def run_on_postgres(statements):
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor == "postgresql":
+            for sql in statements:
+                schema_editor.execute(sql)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_task_filter_presets'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run_on_postgres(search_vector('english')),
+            run_on_postgres(search_vector('simple')),
+        ),
+    ]
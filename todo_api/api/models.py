@@ -1,7 +1,14 @@
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
 from django.contrib.auth.models import User
 
 
+# Partial index predicate matching SoftDeleteManager, so the indexes only cover live rows.
+LIVE = models.Q(deleted=False)
+# ... and the rows purge_deleted scans for.
+DELETED = models.Q(deleted=True)
+
+
 class SoftDeleteManager(models.Manager):
     def get_queryset(self):
         return super().get_queryset().filter(deleted=False)
@@ -27,6 +34,20 @@ class Task(models.Model):
     objects = SoftDeleteManager()
     all_objects = models.Manager()
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["created_by", "created_at", "id"], condition=LIVE, name="task_owner_created_idx"),
+            models.Index(fields=["created_by", "status", "created_at", "id"], condition=LIVE, name="task_owner_status_idx"),
+            models.Index(fields=["created_by", "category"], condition=LIVE, name="task_owner_category_idx"),
+            models.Index(fields=["created_by", "priority"], condition=LIVE, name="task_owner_priority_idx"),
+            models.Index(fields=["created_by", "completed", "created_at", "id"], condition=LIVE, name="task_owner_completed_idx"),
+            models.Index(fields=["created_by", "completed_at", "id"], condition=LIVE, name="task_owner_completed_at_idx"),
+            models.Index(fields=["created_at", "id"], condition=LIVE, name="task_created_idx"),
+            # Delta sync reads soft-deleted rows too, so this one is not partial.
+            models.Index(fields=["created_by", "updated_at", "id"], name="task_owner_updated_idx"),
+            models.Index(fields=["deleted_at", "id"], condition=DELETED, name="task_purge_idx"),
+        ]
+
     def __str__(self):
         return self.title
 
@@ -44,6 +65,10 @@ class Category(models.Model):
 
     class Meta:
         unique_together = ("created_by", "name")
+        indexes = [
+            models.Index(fields=["created_by", "created_at", "id"], condition=LIVE, name="category_owner_created_idx"),
+            models.Index(fields=["deleted_at", "id"], condition=DELETED, name="category_purge_idx"),
+        ]
 
     def __str__(self):
         return self.name
@@ -61,6 +86,53 @@ class Priority(models.Model):
 
     class Meta:
         unique_together = ("created_by", "name")
+        indexes = [
+            models.Index(fields=["created_by", "created_at", "id"], condition=LIVE, name="priority_owner_created_idx"),
+            models.Index(fields=["deleted_at", "id"], condition=DELETED, name="priority_purge_idx"),
+        ]
+
+    def __str__(self):
+        return self.name
+
+
+class TaskCounter(models.Model):
+    """Live (not soft-deleted) task count of one user for one ``dimension=value`` bucket."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="task_counters")
+    dimension = models.CharField(max_length=25)
+    value = models.CharField(max_length=25)
+    count = models.BigIntegerField(default=0)
+
+    class Meta:
+        unique_together = ("user", "dimension", "value")
+
+    def __str__(self):
+        return f"{self.user_id} {self.dimension}={self.value}: {self.count}"
+
+
+class TaskFilterPreset(models.Model):
+    """A named set of ``/api/task/`` filter parameters, applied with ``?preset=<id>``."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="task_filter_presets")
+    name = models.CharField(max_length=100)
+    params = models.JSONField(default=dict)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ("user", "name")
+
+    def __str__(self):
+        return self.name
+
+
+class ArchivedRecord(models.Model):
+    """A soft-deleted row moved out of its table by ``purge_deleted --archive``."""
+    model = models.CharField(max_length=50)
+    object_id = models.BigIntegerField()
+    data = models.JSONField(encoder=DjangoJSONEncoder)
+    deleted_at = models.DateTimeField(null=True)
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["model", "object_id"], name="archive_object_idx")]
 
     def __str__(self):
-        return self.name 
+        return f"{self.model} {self.object_id}"
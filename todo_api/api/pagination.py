@@ -0,0 +1,170 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import datetime
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+def _flip(field):
+    return field[1:] if field.startswith("-") else "-" + field
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Cursor pagination that seeks on the full ordering tuple instead of an offset.
+
+    The requested ordering (``?ordering=`` through ``OrderingFilter``) is
+    completed with ``created_at`` and the primary key, so every row has a
+    unique position and a deep page is answered with the same index range scan
+    as the first one. Ordering fields must be non-nullable.
+    """
+    page_size_query_param = "page_size"
+    max_page_size = 1000
+    ordering = ("-created_at",)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        queryset = self.get_page_queryset(queryset, request, view)
+        if queryset is None:
+            return None
+        return self.set_page(list(queryset))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        queryset = self.get_page_queryset(queryset, request, view)
+        if queryset is None:
+            return None
+        return self.set_page([obj async for obj in queryset])
+
+    def get_page_queryset(self, queryset, request, view=None):
+        """The (lazy) queryset of one page plus a look-ahead row; ``None`` if paging is off."""
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request, queryset)
+
+        self.reverse = self.cursor is not None and self.cursor["reverse"]
+        ordering = tuple(_flip(f) for f in self.ordering) if self.reverse else self.ordering
+        queryset = queryset.order_by(*ordering)
+        if self.cursor is not None:
+            queryset = queryset.filter(self.seek(ordering, self.cursor["position"]))
+        return queryset[:self.page_size + 1]
+
+    def set_page(self, results):
+        has_more = len(results) > self.page_size
+        self.page = results[:self.page_size]
+
+        if self.reverse:
+            self.page.reverse()
+            self.has_next = True
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = self.cursor is not None
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+        return self.page
+
+    def get_ordering(self, request, queryset, view):
+        default = getattr(view, "ordering", None) or type(self).ordering
+        if isinstance(default, str):
+            default = (default,)
+
+        ordering = None
+        for backend in getattr(view, "filter_backends", []):
+            if hasattr(backend, "get_ordering"):
+                ordering = backend().get_ordering(request, queryset, view)
+                break
+        if isinstance(ordering, str):
+            ordering = (ordering,)
+        ordering = list(ordering or default)
+
+        # A filter may lead with an annotation (e.g. the search rank); keep it first.
+        leading = queryset.query.order_by[:1]
+        if leading and isinstance(leading[0], str) and leading[0].lstrip("-") in queryset.query.annotations:
+            ordering = [leading[0]] + [f for f in ordering if f.lstrip("-") != leading[0].lstrip("-")]
+
+        names = [f.lstrip("-") for f in ordering]
+        assert all("__" not in name for name in names), (
+            "Keyset pagination does not support double underscore lookups for orderings."
+        )
+
+        for field in default:
+            if field.lstrip("-") not in names:
+                ordering.append(field)
+                names.append(field.lstrip("-"))
+
+        pk = queryset.model._meta.pk.name
+        if pk not in names and "pk" not in names:
+            ordering.append("-" + pk if ordering[-1].startswith("-") else pk)
+        return tuple(ordering)
+
+    def seek(self, ordering, position):
+        """
+        Build ``(a, b, c) > (x, y, z)`` as ``a > x OR (a = x AND b > y) OR ...``
+        honouring the direction of each ordering field.
+        """
+        condition = Q()
+        equal = {}
+        for field, value in zip(ordering, position):
+            name = field.lstrip("-")
+            lookup = "lt" if field.startswith("-") else "gt"
+            condition |= Q(**equal, **{f"{name}__{lookup}": value})
+            equal[name] = value
+        return condition
+
+    def decode_cursor(self, request, queryset=None):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+
+        try:
+            payload = json.loads(urlsafe_b64decode(encoded.encode("ascii")))
+            raw = payload["p"]
+            if len(raw) != len(self.ordering):
+                raise ValueError
+            fields = [self.get_position_field(queryset, f.lstrip("-")) for f in self.ordering]
+            position = [field.to_python(value) for field, value in zip(fields, raw)]
+        except (TypeError, ValueError, KeyError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+        return {"reverse": bool(payload.get("r")), "position": position}
+
+    def get_position_field(self, queryset, name):
+        try:
+            return queryset.model._meta.get_field(name)
+        except FieldDoesNotExist:
+            return queryset.query.annotations[name].output_field
+
+    def encode_cursor(self, reverse, instance):
+        position = []
+        for field in self.ordering:
+            name = field.lstrip("-")
+            value = instance[name] if isinstance(instance, dict) else getattr(instance, name)
+            position.append(value.isoformat() if isinstance(value, datetime) else value)
+        payload = {"p": position}
+        if reverse:
+            payload["r"] = 1
+        encoded = urlsafe_b64encode(json.dumps(payload, separators=(",", ":")).encode("ascii"))
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded.decode("ascii"))
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(False, self.page[-1])
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(True, self.page[0])
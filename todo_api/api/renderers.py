@@ -0,0 +1,43 @@
+try:
+    import orjson
+except ImportError:  # optional: plain JSONRenderer output without it
+    orjson = None
+
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+
+class ORJSONRenderer(JSONRenderer):
+    """
+    ``JSONRenderer`` backed by orjson when it is installed.
+
+    Produces the same bytes as ``JSONRenderer`` under the default UNICODE_JSON /
+    COMPACT_JSON settings for payloads without floats (orjson writes exponents
+    differently, e.g. ``1e16`` for ``1e+16``). Indented output, and anything orjson
+    cannot encode, goes through ``JSONRenderer``.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (
+            orjson is None or data is None or self.ensure_ascii or not self.compact
+            or self.get_indent(accepted_media_type, renderer_context or {}) is not None
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = dumps(data)
+        except TypeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        return ret.replace("\u2028".encode(), b"\\u2028").replace("\u2029".encode(), b"\\u2029")
+
+
+_default = JSONEncoder().default
+
+
+def dumps(data):
+    """Compact UTF-8 JSON of ``data``; types orjson would format its own way go through DRF's encoder."""
+    if orjson is None:
+        return JSONEncoder(ensure_ascii=False, separators=(",", ":")).encode(data).encode()
+    return orjson.dumps(
+        data, default=_default,
+        option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS,
+    )
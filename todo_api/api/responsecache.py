@@ -0,0 +1,136 @@
+"""
+Per-user cache of list/retrieve responses.
+
+Entries are keyed on the user's generation token, the action, the object id and
+the normalized query string, so every write a user makes (``bump``) retires all
+of their cached responses at once. The cache is the ``responses`` alias: a
+bounded local-memory cache unless RESPONSE_CACHE_URL points at a shared one.
+Entries still expire after its TIMEOUT, which bounds how long a response read
+from a lagging replica can be served.
+"""
+import hashlib
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timezone as dt_timezone
+
+from django.core.cache import caches
+from django.db import transaction
+from django.utils.http import parse_http_date_safe, urlencode
+
+from rest_framework.response import Response
+
+
+RESPONSE_CACHE = "responses"
+
+_stats = Counter()
+_stats_lock = threading.Lock()
+
+
+def _count(event):
+    with _stats_lock:
+        _stats[event] += 1
+
+
+def stats():
+    """Hit/miss/wait counts of this process."""
+    with _stats_lock:
+        return {key: _stats[key] for key in ("hits", "misses", "waits")}
+
+
+def _generation_key(user_id):
+    return f"response-generation:{user_id}"
+
+
+def generation(user_id):
+    cache = caches[RESPONSE_CACHE]
+    token = cache.get(_generation_key(user_id))
+    if token is None:
+        token = uuid.uuid4().hex
+        if not cache.add(_generation_key(user_id), token, None):
+            token = cache.get(_generation_key(user_id))
+    return token
+
+
+def bump(*user_ids):
+    """
+    Retire the users' cached responses now and again once the current transaction
+    commits, dropping anything a concurrent request cached in between.
+    """
+    def retire():
+        caches[RESPONSE_CACHE].set_many({_generation_key(user_id): uuid.uuid4().hex for user_id in user_ids}, None)
+    if user_ids:
+        retire()
+        transaction.on_commit(retire)
+
+
+class ResponseCacheMixin:
+    """
+    Serve non-staff ``list``/``retrieve`` from the response cache. On a miss only
+    one request per key computes the response (a lock entry in the cache); the
+    others poll for it for up to ``response_cache_wait`` seconds before giving up
+    and computing it themselves. Expects ``ConditionalGetMixin`` further down
+    the MRO, whose validators are cached with the data.
+    """
+    response_cache_wait = 2.0
+    response_cache_poll = 0.02
+    response_cache_lock_timeout = 10
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(super().retrieve, request, *args, **kwargs)
+
+    def get_response_cache_key(self, request):
+        query = urlencode(sorted((k, [v for v in vs if v != ""]) for k, vs in request.query_params.lists()), doseq=True)
+        digest = hashlib.sha1("|".join([
+            request.build_absolute_uri("/"), self.action, str(self.kwargs.get(self.lookup_url_kwarg or self.lookup_field, "")),
+            query, request.headers.get("Accept", ""),
+        ]).encode()).hexdigest()
+        return f"response:{self.basename}:{request.user.pk}:{generation(request.user.pk)}:{digest}"
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        if request.user.is_staff or not request.user.is_authenticated:
+            return handler(request, *args, **kwargs)
+
+        cache = caches[RESPONSE_CACHE]
+        key = self.get_response_cache_key(request)
+        entry = cache.get(key)
+        if entry is None:
+            if cache.add(key + ":lock", 1, self.response_cache_lock_timeout):
+                _count("misses")
+                try:
+                    response = handler(request, *args, **kwargs)
+                    if response.status_code == 200 and response.has_header("ETag"):
+                        last_modified = parse_http_date_safe(response.get("Last-Modified", ""))
+                        cache.set(key, (response.data, response.get("ETag"), last_modified))
+                    return response
+                finally:
+                    cache.delete(key + ":lock")
+            entry = self.wait_for(cache, key)
+            if entry is None:
+                _count("misses")
+                return handler(request, *args, **kwargs)
+        else:
+            _count("hits")
+
+        data, etag, last_modified = entry
+        if last_modified is not None:
+            last_modified = datetime.fromtimestamp(last_modified, dt_timezone.utc)
+        if self.is_not_modified(etag, last_modified):
+            return self.not_modified(etag, last_modified)
+        return self.with_validators(Response(data), etag, last_modified)
+
+    def wait_for(self, cache, key):
+        deadline = time.monotonic() + self.response_cache_wait
+        while time.monotonic() < deadline:
+            time.sleep(self.response_cache_poll)
+            entry = cache.get(key)
+            if entry is not None:
+                _count("waits")
+                return entry
+            if cache.get(key + ":lock") is None:
+                return None
+        return None
@@ -0,0 +1,98 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import caches
+
+from rest_framework.permissions import SAFE_METHODS
+
+
+# Set while a request that may be answered from a replica is being handled.
+_replica_reads = ContextVar("replica_reads", default=False)
+
+
+def _sticky_key(user_id):
+    return f"replica-sticky:{user_id}"
+
+
+def _sticky_cache():
+    return caches[getattr(settings, "REPLICA_STICKY_CACHE", "default")]
+
+
+def mark_sticky(user_id):
+    """Pin ``user_id``'s reads to the primary for REPLICA_STICKY_SECONDS after a write."""
+    _sticky_cache().set(_sticky_key(user_id), True, getattr(settings, "REPLICA_STICKY_SECONDS", 5))
+
+
+def is_sticky(user_id):
+    return bool(_sticky_cache().get(_sticky_key(user_id)))
+
+
+async def ais_sticky(user_id):
+    return bool(await _sticky_cache().aget(_sticky_key(user_id)))
+
+
+def replica_reads_active():
+    return _replica_reads.get()
+
+
+@contextmanager
+def replica_reads(enabled=True):
+    token = _replica_reads.set(enabled)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+class PrimaryReplicaRouter:
+    """
+    Sends reads to a random alias in DATABASE_REPLICAS while ``replica_reads`` is
+    active and everything else to ``default``. Replicas hold the same data, so
+    relations are allowed across aliases, and only ``default`` is migrated.
+    """
+
+    def db_for_read(self, model, **hints):
+        replicas = getattr(settings, "DATABASE_REPLICAS", [])
+        if replicas and replica_reads_active():
+            return random.choice(replicas)
+        return "default"
+
+    def db_for_write(self, model, **hints):
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == "default"
+
+
+class ReplicaReadsMixin:
+    """
+    Serve safe requests for ``replica_actions`` from a replica unless the user
+    wrote something within the last REPLICA_STICKY_SECONDS (read-your-writes).
+    Any unsafe request renews that window.
+    """
+    replica_actions = ("list", "retrieve")
+
+    def dispatch(self, request, *args, **kwargs):
+        # Reset on the way out of dispatch: finalize_response is skipped when the view
+        # raises, and the flag would stay set for the thread's later requests.
+        self._replica_token = None
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        finally:
+            if self._replica_token is not None:
+                _replica_reads.reset(self._replica_token)
+                self._replica_token = None
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        user_id = request.user.pk
+        if request.method not in SAFE_METHODS:
+            if user_id is not None:
+                mark_sticky(user_id)
+        elif self.action in self.replica_actions and not (user_id is not None and is_sticky(user_id)):
+            self._replica_token = _replica_reads.set(True)
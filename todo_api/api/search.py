@@ -0,0 +1,62 @@
+from django.db import connections
+from django.db.models import BooleanField, FloatField
+from django.db.models.expressions import RawSQL
+
+from rest_framework import filters
+from rest_framework.settings import api_settings
+
+
+# Text search configuration of the search_vector column (migration 0008); queries
+# must use the same one or stemmed terms stop matching.
+SEARCH_CONFIG = "english"
+
+
+class TaskSearchFilter(filters.SearchFilter):
+    """
+    ``?search=`` backed by the full-text index from migration 0003.
+
+    Postgres matches against the GIN-indexed ``search_vector`` column and SQLite
+    against the ``api_task_fts`` FTS5 table; any other backend falls back to
+    ``SearchFilter``'s icontains lookups over ``search_fields``. Matches are
+    annotated with ``search_rank`` and returned best first unless the client
+    asked for an explicit ``?ordering=``.
+    """
+    rank_annotation = "search_rank"
+
+    def filter_queryset(self, request, queryset, view):
+        terms = self.get_search_terms(request)
+        if not terms:
+            return queryset
+
+        vendor = connections[queryset.db].vendor
+        table = queryset.model._meta.db_table
+        if vendor == "postgresql":
+            query = " ".join(terms)
+            match = RawSQL(
+                f"\"{table}\".\"search_vector\" @@ plainto_tsquery('{SEARCH_CONFIG}', %s)",
+                [query], output_field=BooleanField(),
+            )
+            # ts_rank returns real; the rank is a keyset cursor position, so compare it
+            # as the double precision the cursor round-trips through JSON.
+            rank = RawSQL(
+                f"ts_rank(\"{table}\".\"search_vector\", plainto_tsquery('{SEARCH_CONFIG}', %s))::double precision",
+                [query], output_field=FloatField(),
+            )
+        elif vendor == "sqlite":
+            query = " ".join('"%s"' % term.replace('"', '""') for term in terms)
+            match = RawSQL(
+                f"\"{table}\".\"id\" IN (SELECT rowid FROM {table}_fts WHERE {table}_fts MATCH %s)",
+                [query], output_field=BooleanField(),
+            )
+            rank = RawSQL(
+                f"(SELECT -bm25({table}_fts) FROM {table}_fts "
+                f"WHERE {table}_fts MATCH %s AND rowid = \"{table}\".\"id\")",
+                [query], output_field=FloatField(),
+            )
+        else:
+            return super().filter_queryset(request, queryset, view)
+
+        queryset = queryset.filter(match).annotate(**{self.rank_annotation: rank})
+        if api_settings.ORDERING_PARAM not in request.query_params:
+            queryset = queryset.order_by("-" + self.rank_annotation, *queryset.query.order_by)
+        return queryset
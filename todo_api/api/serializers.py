@@ -1,14 +1,25 @@
+from functools import cached_property
+
 from rest_framework import serializers
+from django.db import transaction
 from django.utils import timezone
 from django.contrib.auth.models import User
-from .models import Task, Category, Priority
+from .models import Task, Category, Priority, TaskFilterPreset
+from . import counters, events, lookups, responsecache
+from .filters import TaskFilter
+from .metrics import SerializerTimingMixin
+
+
+class TimedListSerializer(SerializerTimingMixin, serializers.ListSerializer):
+    pass
 
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(SerializerTimingMixin, serializers.ModelSerializer):
     password = serializers.CharField(write_only=True)
 
     class Meta:
         model = User
+        list_serializer_class = TimedListSerializer
         fields = ["id", "username", "email", "password"]
 
     def create(self, validated_data):
@@ -17,39 +28,184 @@ class UserSerializer(serializers.ModelSerializer):
         user.save()
         return user
 
-class CategorySerializer(serializers.ModelSerializer):
+class CategorySerializer(SerializerTimingMixin, serializers.ModelSerializer):
     class Meta:
         model = Category
+        list_serializer_class = TimedListSerializer
         fields = "__all__"
         read_only_fields = ['created_by',]
 
-class PrioritySerializer(serializers.ModelSerializer):
+class PrioritySerializer(SerializerTimingMixin, serializers.ModelSerializer):
     class Meta:
         model = Priority
+        list_serializer_class = TimedListSerializer
         fields = "__all__"
         read_only_fields = ['created_by',]
 
-class TaskSerializer(serializers.ModelSerializer):
+class TaskFilterPresetSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = TaskFilterPreset
+        fields = ["id", "name", "params", "created_at"]
+
+    def validate_params(self, params):
+        if not isinstance(params, dict) or not all(isinstance(value, str) for value in params.values()):
+            raise serializers.ValidationError("Expected an object of query parameter strings.")
+        unknown = set(params) - set(TaskFilter.param_names())
+        if unknown:
+            raise serializers.ValidationError(f"Unknown filters: {', '.join(sorted(unknown))}.")
+        filterset = TaskFilter(params, queryset=Task.objects.none())
+        if not filterset.is_valid():
+            raise serializers.ValidationError(filterset.errors)
+        return params
+
+    def validate_name(self, name):
+        user = self.context["request"].user
+        presets = TaskFilterPreset.objects.filter(user=user, name=name)
+        if self.instance is not None:
+            presets = presets.exclude(pk=self.instance.pk)
+        if presets.exists():
+            raise serializers.ValidationError("You already have a preset with this name.")
+        return name
+
+class TaskListSerializer(TimedListSerializer):
+    """Bulk writes for ``TaskSerializer(many=True)``: one INSERT or UPDATE for the whole batch."""
+
+    @cached_property
+    def instance_map(self):
+        return {str(task.pk): task for task in self.instance or []}
+
+    def run_child_validation(self, data):
+        if self.instance is not None:
+            self.child.instance = self.instance_map.get(str(data.get("id")) if isinstance(data, dict) else None)
+        return super().run_child_validation(data)
+
+    def create(self, validated_data):
+        tasks = [Task(**self.child.prepare_create(attrs)) for attrs in validated_data]
+        with transaction.atomic():
+            tasks = Task.objects.bulk_create(tasks)
+            counters.record_many((task.created_by_id, None, counters.task_keys(task)) for task in tasks)
+            responsecache.bump(*{task.created_by_id for task in tasks})
+            events.publish_tasks("created", tasks)
+        return tasks
+
+    def update(self, instances, validated_data):
+        """Writes only the tasks that changed, one UPDATE per distinct set of changed columns."""
+        changes = []
+        groups = {}
+        now = timezone.now()
+        for task, attrs in zip(instances, validated_data):
+            old_keys = counters.task_keys(task)
+            fields = self.child.apply_changes(task, attrs)
+            if not fields:
+                continue
+            task.updated_at = now
+            groups.setdefault(frozenset(fields), []).append(task)
+            changes.append((task.created_by_id, old_keys, counters.task_keys(task)))
+        if not changes:
+            return instances
+        changed = [task for tasks in groups.values() for task in tasks]
+        with transaction.atomic():
+            for fields, tasks in groups.items():
+                Task.objects.bulk_update(tasks, [*fields, "updated_at"])
+            counters.record_many(changes)
+            responsecache.bump(*{task.created_by_id for task in changed})
+            events.publish_tasks("updated", changed)
+        return instances
+
+
+class OwnedPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """
+    Accepts only the requesting user's rows (any row for staff). A user's ids are
+    checked against the per-user lookup cache, so a warm write runs no query here;
+    an id the cache does not know is looked up, since the row may have been added
+    out of band (admin, shell, another worker), and then retires the stale entry.
+    """
+
+    def to_internal_value(self, data):
+        request = self.context.get("request")
+        if request is None or request.user.is_staff:
+            return super().to_internal_value(data)
+        if isinstance(data, bool):
+            self.fail("incorrect_type", data_type=type(data).__name__)
+        try:
+            pk = int(data)
+        except (TypeError, ValueError):
+            self.fail("incorrect_type", data_type=type(data).__name__)
+        model = self.queryset.model
+        if pk not in lookups.ids_for(model, request.user.pk):
+            if not self.get_queryset().filter(pk=pk).exists():
+                self.fail("does_not_exist", pk_value=data)
+            lookups.invalidate(model, request.user.pk)
+        return model(pk=pk, created_by_id=request.user.pk)
+
+    def get_queryset(self):
+        queryset = super().get_queryset().only("id")
+        request = self.context.get("request")
+        if request is not None and not request.user.is_staff:
+            queryset = queryset.filter(created_by=request.user)
+        return queryset
+
+
+class TaskSerializer(SerializerTimingMixin, serializers.ModelSerializer):
     created_by = serializers.PrimaryKeyRelatedField(read_only=True)
-    category = serializers.PrimaryKeyRelatedField(queryset=Category.objects.filter(deleted=False), allow_null=True, required=False)
-    priority = serializers.PrimaryKeyRelatedField(queryset=Category.objects.filter(deleted=False), allow_null=True, required=False)
+    category = OwnedPrimaryKeyRelatedField(queryset=Category.objects.all(), allow_null=True, required=False)
+    priority = OwnedPrimaryKeyRelatedField(queryset=Priority.objects.all(), allow_null=True, required=False)
 
     class Meta:
         model = Task
         fields = "__all__"
         read_only_fields = ['created_by',]
+        list_serializer_class = TaskListSerializer
 
-    def create(self, validated_data):
+    def prepare_create(self, validated_data):
         if validated_data.get("completed") and not validated_data.get("completed_at"):
             validated_data["completed_at"] = timezone.now()
-        return super().create(validated_data)
+        return validated_data
 
-    def update(self, instance, validated_data):
+    def prepare_update(self, instance, validated_data):
         completed = validated_data.get("completed", instance.completed)
         if completed and not instance.completed_at and not validated_data.get("completed_at"):
             validated_data["completed_at"] = timezone.now()
 
         if not completed:
             validated_data["completed_at"] = None
+        return validated_data
+
+    def create(self, validated_data):
+        validated_data = self.prepare_create(validated_data)
+        with transaction.atomic():
+            task = super().create(validated_data)
+            counters.record(task.created_by_id, new=counters.task_keys(task))
+            responsecache.bump(task.created_by_id)
+            events.publish(task.created_by_id, "task", "created", [task.pk])
+        return task
+
+    def apply_changes(self, instance, validated_data):
+        """Set the validated values that differ from ``instance``; returns the changed field names."""
+        changed = []
+        for attr, value in self.prepare_update(instance, validated_data).items():
+            field = Task._meta.get_field(attr)
+            if field.is_relation:
+                current, new = getattr(instance, field.attname), getattr(value, "pk", None)
+            else:
+                current, new = getattr(instance, attr), value
+            if current != new:
+                setattr(instance, attr, value)
+                changed.append(attr)
+        return changed
 
-        return super().update(instance, validated_data)
+    def update(self, instance, validated_data):
+        """
+        Saves only the changed columns (plus ``updated_at``); a request that
+        changes nothing writes nothing and leaves ``updated_at`` alone.
+        """
+        old_keys = counters.task_keys(instance)
+        changed = self.apply_changes(instance, validated_data)
+        if not changed:
+            return instance
+        with transaction.atomic():
+            instance.save(update_fields=[*changed, "updated_at"])
+            counters.record(instance.created_by_id, old=old_keys, new=counters.task_keys(instance))
+            responsecache.bump(instance.created_by_id)
+            events.publish(instance.created_by_id, "task", "updated", [instance.pk])
+        return instance
@@ -0,0 +1,74 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+
+# Rows written this recently may still have concurrent transactions committing
+# with an earlier updated_at; a final page does not move the cursor past them.
+SETTLE = timedelta(seconds=5)
+
+
+class CursorExpired(Exception):
+    """The cursor predates the tombstone retention window, so deletions may have been purged since."""
+
+
+def encode_cursor(updated_at, pk):
+    payload = json.dumps({"t": updated_at.isoformat(), "i": pk}, separators=(",", ":"))
+    return urlsafe_b64encode(payload.encode("ascii")).decode("ascii")
+
+
+def decode_cursor(cursor):
+    """``(updated_at, pk)`` of a cursor from ``encode_cursor``; raises ValueError if malformed."""
+    try:
+        payload = json.loads(urlsafe_b64decode(cursor.encode("ascii")))
+        updated_at, pk = parse_datetime(payload["t"]), int(payload["i"])
+    except (TypeError, KeyError, UnicodeEncodeError):
+        raise ValueError("invalid cursor")
+    if updated_at is None or timezone.is_naive(updated_at):
+        raise ValueError("invalid cursor")
+    return updated_at, pk
+
+
+def _position(row):
+    return (row["updated_at"], row["id"]) if isinstance(row, dict) else (row.updated_at, row.pk)
+
+
+def changes_since(queryset, cursor, limit):
+    """
+    One page of rows of ``queryset`` (which must include soft-deleted rows)
+    changed after ``cursor``, in ``(updated_at, id)`` order.
+
+    ``queryset`` may be a ``values()`` queryset including ``updated_at`` and ``id``.
+    Returns ``(rows, next_cursor, has_more)``. Without a cursor only live rows are
+    returned: a fresh client has nothing to delete. Raises ``CursorExpired`` for a
+    cursor older than SOFT_DELETE_RETENTION_DAYS.
+    """
+    since = None
+    if cursor is None:
+        queryset = queryset.filter(deleted=False)
+    else:
+        since = decode_cursor(cursor)
+        if since[0] < timezone.now() - timedelta(days=settings.SOFT_DELETE_RETENTION_DAYS):
+            raise CursorExpired
+        queryset = queryset.filter(Q(updated_at__gt=since[0]) | Q(updated_at=since[0], pk__gt=since[1]))
+
+    rows = list(queryset.order_by("updated_at", "pk")[:limit + 1])
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    settled = (timezone.now() - SETTLE, 0)
+    if rows and (has_more or _position(rows[-1]) <= settled):
+        position = _position(rows[-1])
+    elif rows:
+        # The tail is still settling: hand it out now, but send it again next time.
+        position = max(since, settled) if since else settled
+    else:
+        # Nothing new: still move an old cursor up to the settled point, so a client
+        # that polls regularly never falls out of the retention window.
+        position = max(since, settled) if since else settled
+    return rows, encode_cursor(*position), has_more
@@ -1,10 +1,66 @@
-from django.test import TestCase
+import asyncio
+import csv
+import json
+import os
+import time
+from datetime import timedelta
+from io import StringIO
+from unittest import mock, skipUnless
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection, connections
+from django.db.models import F
+from django.test.utils import CaptureQueriesContext
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
 from django.contrib.auth.models import User
+from rest_framework.authtoken.models import Token
+from rest_framework.renderers import JSONRenderer
 from rest_framework.test import APIClient
-from .models import Task, Category, Priority
+from rest_framework.utils.encoders import JSONEncoder
+from . import events, hashers, lookups, metrics, sync
+from .fastpath import row_serializer
+from .models import ArchivedRecord, Task, Category, Priority, TaskCounter, TaskFilterPreset
+from .renderers import ORJSONRenderer
+from .responsecache import ResponseCacheMixin
+from .serializers import TaskSerializer
+from .routers import PrimaryReplicaRouter, replica_reads_active
+from .views import TaskViewSet
+
+# DB_REPLICAS aliases mirror the test database but on connections of their own,
+# which cannot see the uncommitted rows of a TestCase; ReplicaRoutingTests
+# commits its rows and reads through them.
+# (Assigned rather than overridden: override_settings hides SETTINGS_MODULE,
+# which importtime_report hands to its subprocess.)
+REPLICAS = settings.DATABASE_REPLICAS
+
+
+def setUpModule():
+    settings.DATABASE_REPLICAS = []
+
+
+def tearDownModule():
+    settings.DATABASE_REPLICAS = REPLICAS
+
+
+# For tests that count queries or cache lookups behind the response cache.
+WITHOUT_RESPONSE_CACHE = override_settings(
+    CACHES={**settings.CACHES, 'responses': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}},
+)
+
+
+def clear_caches():
+    for cache in caches.all():
+        cache.clear()
+
 
 class ApiTests(TestCase):
     def setUp(self):
+        clear_caches()
         self.user = User.objects.create_user(username='u1', password='pass')
         self.other = User.objects.create_user(username='u2', password='pass')
         self.client = APIClient()
@@ -13,20 +69,20 @@ class ApiTests(TestCase):
         self.pri = Priority.objects.create(name='P1', created_by=self.user)
 
     def test_create_task_and_filter(self):
-        r = self.client.post('/api/tasks/', {'title':'T1','status':'new','category':self.cat.id,'priority':self.pri.id})
+        r = self.client.post('/api/task/', {'title':'T1','status':'new','category':self.cat.id,'priority':self.pri.id})
         self.assertEqual(r.status_code, 201)
-        r2 = self.client.get('/api/tasks/?status=new')
+        r2 = self.client.get('/api/task/?status=new')
         self.assertEqual(r2.status_code, 200)
-        self.assertEqual(len(r2.json()), 1)
+        self.assertEqual(len(r2.json()['results']), 1)
 
     def test_visibility_scoped(self):
         Task.objects.create(title='X', status='new', created_by=self.other)
-        r = self.client.get('/api/tasks/')
-        self.assertEqual(len(r.json()), 0)
+        r = self.client.get('/api/task/')
+        self.assertEqual(len(r.json()['results']), 0)
 
     def test_soft_delete_user_hard_delete_admin(self):
         t = Task.objects.create(title='T2', status='new', created_by=self.user)
-        r = self.client.delete(f'/api/tasks/{t.id}/')
+        r = self.client.delete(f'/api/task/{t.id}/')
         self.assertIn(r.status_code, [204, 200, 202])
         t.refresh_from_db()
         self.assertTrue(t.deleted)
@@ -36,3 +92,1110 @@ class ApiTests(TestCase):
         self.assertEqual(r.status_code, 200)
         r2 = self.client.post('/api/users/change_password/', {'old_password':'pass','new_password':'newpass'})
         self.assertEqual(r2.status_code, 200)
+
+    def test_task_list_keyset_pages_with_tied_created_at(self):
+        for i in range(5):
+            Task.objects.create(title=f'T{i}', status='new' if i % 2 else 'completed', created_by=self.user)
+        Task.objects.update(created_at=timezone.now())
+        for ordering in ['', '&ordering=status', '&ordering=created_at']:
+            seen = []
+            url = '/api/task/?page_size=2' + ordering
+            while url:
+                r = self.client.get(url).json()
+                seen += [t['id'] for t in r['results']]
+                url = r['next']
+            self.assertEqual(sorted(seen), sorted(Task.objects.values_list('id', flat=True)))
+            self.assertEqual(len(seen), 5)
+
+    def test_task_list_previous_link(self):
+        for i in range(3):
+            Task.objects.create(title=f'T{i}', status='new', created_by=self.user)
+        first = self.client.get('/api/task/?page_size=2').json()
+        second = self.client.get(first['next']).json()
+        self.assertEqual(len(second['results']), 1)
+        back = self.client.get(second['previous']).json()
+        self.assertEqual(back['results'], first['results'])
+
+    def test_invalid_cursor(self):
+        r = self.client.get('/api/task/?cursor=bogus')
+        self.assertEqual(r.status_code, 404)
+
+    def test_category_and_priority_lists_paginated(self):
+        r = self.client.get('/api/categories/')
+        self.assertEqual([c['id'] for c in r.json()['results']], [self.cat.id])
+        r = self.client.get('/api/priorities/')
+        self.assertEqual([p['id'] for p in r.json()['results']], [self.pri.id])
+
+    def test_search_is_ranked_and_tracks_writes(self):
+        Task.objects.create(title='Buy milk', description='from the shop', created_by=self.user)
+        best = Task.objects.create(title='Milk the cow', description='fresh milk for the milk shop', created_by=self.user)
+        Task.objects.create(title='Walk the dog', created_by=self.user)
+        Task.objects.create(title='Buy milk', created_by=self.other)
+        r = self.client.get('/api/task/?search=milk')
+        self.assertEqual([t['id'] for t in r.json()['results']][0], best.id)
+        self.assertEqual(len(r.json()['results']), 2)
+
+        self.client.patch(f'/api/task/{best.id}/', {'title': 'Feed the cow', 'description': ''})
+        r = self.client.get('/api/task/?search=milk')
+        self.assertNotIn(best.id, [t['id'] for t in r.json()['results']])
+
+    def test_search_pages_by_rank(self):
+        for i in range(5):
+            Task.objects.create(title='report ' * (i + 1), created_by=self.user)
+        seen = []
+        url = '/api/task/?search=report&page_size=2'
+        while url:
+            r = self.client.get(url).json()
+            seen += [t['id'] for t in r['results']]
+            url = r['next']
+        self.assertEqual(len(seen), 5)
+        self.assertEqual(len(set(seen)), 5)
+
+    def test_search_pages_through_rank_ties(self):
+        tasks = [Task.objects.create(title='weekly report', created_by=self.user).id for _ in range(5)]
+        seen = []
+        url = '/api/task/?search=reports&page_size=2'
+        while url:
+            r = self.client.get(url).json()
+            seen += [t['id'] for t in r['results']]
+            url = r['next']
+        self.assertEqual(seen, sorted(tasks, reverse=True))
+
+    def test_search_matches_status(self):
+        Task.objects.create(title='Done', status='completed', created_by=self.user)
+        Task.objects.create(title='Todo', status='new', created_by=self.user)
+        r = self.client.get('/api/task/?search=completed')
+        self.assertEqual([t['title'] for t in r.json()['results']], ['Done'])
+
+    def test_stats_follow_writes(self):
+        r = self.client.post('/api/task/', {'title': 'A', 'category': self.cat.id, 'priority': self.pri.id})
+        a = r.json()['id']
+        self.client.post('/api/task/', {'title': 'B', 'status': 'in_progress'})
+        self.client.patch(f'/api/task/{a}/', {'completed': True, 'status': 'completed'})
+        b = Task.objects.get(title='B')
+        self.client.delete(f'/api/task/{b.id}/')
+
+        with self.assertNumQueries(1):
+            r = self.client.get('/api/task/stats/')
+        self.assertEqual(r.json(), {
+            'total': 1,
+            'status': {'completed': 1},
+            'completed': {'true': 1},
+            'category': {str(self.cat.id): 1},
+            'priority': {str(self.pri.id): 1},
+        })
+
+    def test_rebuild_task_counters_reports_and_fixes_drift(self):
+        self.client.post('/api/task/', {'title': 'A'})
+        Task.objects.create(title='Behind the API', created_by=self.user)
+        out = StringIO()
+        call_command('rebuild_task_counters', '--dry-run', stdout=out)
+        self.assertIn('user %d total=: stored 1, actual 2' % self.user.id, out.getvalue())
+        self.assertEqual(TaskCounter.objects.get(user=self.user, dimension='total').count, 1)
+
+        call_command('rebuild_task_counters', stdout=StringIO())
+        self.assertEqual(self.client.get('/api/task/stats/').json()['total'], 2)
+        out = StringIO()
+        call_command('rebuild_task_counters', '--dry-run', stdout=out)
+        self.assertIn('0 drifted', out.getvalue())
+
+    def test_bulk_create_update_delete(self):
+        r = self.client.post('/api/task/bulk/', [
+            {'title': 'A', 'completed': True, 'category': self.cat.id},
+            {'title': 'B', 'priority': self.pri.id},
+        ], format='json')
+        self.assertEqual(r.status_code, 201)
+        a, b = r.json()
+        self.assertIsNotNone(a['completed_at'])
+        self.assertIsNone(b['completed_at'])
+
+        r = self.client.patch('/api/task/bulk/', [
+            {'id': a['id'], 'completed': False},
+            {'id': str(b['id']), 'completed': True, 'title': 'B2'},
+        ], format='json')
+        self.assertEqual(r.status_code, 200)
+        a, b = Task.objects.get(pk=a['id']), Task.objects.get(pk=b['id'])
+        self.assertIsNone(a.completed_at)
+        self.assertEqual((b.title, b.completed), ('B2', True))
+        self.assertIsNotNone(b.completed_at)
+        self.assertEqual(self.client.get('/api/task/stats/').json()['completed'], {'true': 1, 'false': 1})
+
+        r = self.client.delete('/api/task/bulk/', [a.id, b.id], format='json')
+        self.assertEqual(r.json(), {'deleted': 2})
+        self.assertEqual(Task.objects.count(), 0)
+        self.assertEqual(Task.all_objects.filter(deleted=True).count(), 2)
+        self.assertEqual(self.client.get('/api/task/stats/').json()['total'], 0)
+
+    def test_bulk_reports_per_item_errors_and_writes_nothing(self):
+        r = self.client.post('/api/task/bulk/', [{'title': 'ok'}, {'status': 'bogus'}], format='json')
+        self.assertEqual(r.status_code, 400)
+        self.assertEqual(r.json()[0], {})
+        self.assertIn('title', r.json()[1])
+        self.assertEqual(Task.objects.count(), 0)
+
+        mine = Task.objects.create(title='M', created_by=self.user)
+        theirs = Task.objects.create(title='X', created_by=self.other)
+        r = self.client.patch('/api/task/bulk/', [{'id': mine.id, 'title': 'M2'}, {'id': theirs.id, 'title': 'X2'}], format='json')
+        self.assertEqual(r.status_code, 400)
+        self.assertEqual(r.json(), [{}, {'id': ['Not found.']}])
+        mine.refresh_from_db()
+        self.assertEqual(mine.title, 'M')
+
+    def test_token_lookup_is_cached_until_logout(self):
+        token = Token.objects.create(user=self.user)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION='Token ' + token.key)
+        self.assertEqual(client.get('/api/users/me/').status_code, 200)
+        with self.assertNumQueries(0):
+            self.assertEqual(client.get('/api/users/me/').status_code, 200)
+        client.post('/api/users/logout/')
+        self.assertEqual(client.get('/api/users/me/').status_code, 401)
+
+    def test_change_password_evicts_cached_token(self):
+        token = Token.objects.create(user=self.user)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION='Token ' + token.key)
+        client.get('/api/users/me/')
+        client.post('/api/users/change_password/', {'old_password': 'pass', 'new_password': 'newpass'})
+        self.assertEqual(client.get('/api/users/me/').status_code, 401)
+
+    def test_saving_a_user_evicts_their_cached_tokens(self):
+        token = Token.objects.create(user=self.user)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION='Token ' + token.key)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(client.patch('/api/users/me/', {'username': 'renamed'}).status_code, 200)
+        self.assertEqual(client.get('/api/users/me/').json()['username'], 'renamed')
+
+        self.user.is_staff = True
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+        self.assertEqual(client.get('/api/users/').status_code, 200)
+        self.user.is_staff = False
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+        self.assertEqual(client.get('/api/users/').status_code, 403)
+
+    def test_conditional_get_on_list(self):
+        Task.objects.create(title='A', created_by=self.user)
+        r = self.client.get('/api/task/')
+        etag, last_modified = r['ETag'], r['Last-Modified']
+        r = self.client.get('/api/task/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(r.status_code, 304)
+        self.assertEqual(self.client.get('/api/task/?status=new', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+        self.client.post('/api/task/', {'title': 'B'})
+        r = self.client.get('/api/task/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(len(r.json()['results']), 2)
+
+        # A row leaving the filtered set does not move max(updated_at): lists only
+        # answer If-None-Match.
+        r = self.client.get('/api/task/?status=new')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(f"/api/task/{r.json()['results'][0]['id']}/", {'status': 'completed'})
+        r = self.client.get('/api/task/?status=new', HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual((r.status_code, len(r.json()['results'])), (200, 1))
+
+    def test_conditional_get_and_if_match_on_detail(self):
+        t = Task.objects.create(title='A', created_by=self.user)
+        etag = self.client.get(f'/api/task/{t.id}/')['ETag']
+        self.assertEqual(self.client.get(f'/api/task/{t.id}/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertEqual(self.client.get(f'/api/categories/{self.cat.id}/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+        r = self.client.patch(f'/api/task/{t.id}/', {'title': 'B'}, HTTP_IF_MATCH=etag)
+        self.assertEqual(r.status_code, 200)
+        self.assertNotEqual(r['ETag'], etag)
+        r = self.client.patch(f'/api/task/{t.id}/', {'title': 'C'}, HTTP_IF_MATCH=etag)
+        self.assertEqual(r.status_code, 412)
+        t.refresh_from_db()
+        self.assertEqual(t.title, 'B')
+
+    @mock.patch('api.sync.SETTLE', timedelta(0))
+    def test_changes_since_cursor_includes_tombstones(self):
+        a = Task.objects.create(title='A', created_by=self.user)
+        b = Task.objects.create(title='B', created_by=self.user)
+        Task.objects.create(title='X', created_by=self.other)
+        r = self.client.get('/api/task/changes/?limit=1').json()
+        self.assertEqual(([t['id'] for t in r['results']], r['has_more']), ([a.id], True))
+        r = self.client.get(f'/api/task/changes/?since={r["cursor"]}').json()
+        self.assertEqual(([t['id'] for t in r['results']], r['has_more']), ([b.id], False))
+        r = self.client.get(f'/api/task/changes/?since={r["cursor"]}').json()
+        self.assertEqual(r['results'], [])
+        cursor = r['cursor']
+
+        self.client.delete(f'/api/task/{a.id}/')
+        self.client.patch(f'/api/task/{b.id}/', {'title': 'B2'})
+        r = self.client.get(f'/api/task/changes/?since={cursor}').json()
+        self.assertEqual([(t['id'], t['deleted']) for t in r['results']], [(a.id, True), (b.id, False)])
+
+    def test_staff_deleting_a_category_reports_its_tasks_as_changed(self):
+        task = Task.objects.create(title='A', category=self.cat, priority=self.pri, created_by=self.user)
+        Task.objects.filter(pk=task.pk).update(updated_at=timezone.now() - timedelta(hours=1))
+        cursor = self.client.get('/api/task/changes/').json()['cursor']
+        staff = APIClient()
+        staff.force_authenticate(User.objects.create_user(username='admin', password='pass', is_staff=True))
+        self.assertEqual(staff.delete(f'/api/categories/{self.cat.id}/').status_code, 204)
+        self.assertEqual(staff.delete(f'/api/priorities/{self.pri.id}/').status_code, 204)
+        r = self.client.get(f'/api/task/changes/?since={cursor}').json()
+        self.assertEqual([(t['id'], t['category'], t['priority']) for t in r['results']], [(task.id, None, None)])
+
+    def test_idle_client_keeps_its_cursor_within_retention(self):
+        task = Task.objects.create(title='A', created_by=self.user)
+        Task.objects.filter(pk=task.pk).update(updated_at=timezone.now() - timedelta(hours=1))
+        cursor = self.client.get('/api/task/changes/').json()['cursor']
+        start = timezone.now()
+        for days in (20, 40, 60):
+            with mock.patch('api.sync.timezone.now', return_value=start + timedelta(days=days)):
+                r = self.client.get(f'/api/task/changes/?since={cursor}')
+            self.assertEqual(r.status_code, 200)
+            self.assertEqual(r.json()['results'], [])
+            cursor = r.json()['cursor']
+
+    def test_changes_resends_unsettled_rows(self):
+        a = Task.objects.create(title='A', created_by=self.user)
+        r = self.client.get('/api/task/changes/').json()
+        r = self.client.get(f'/api/task/changes/?since={r["cursor"]}').json()
+        self.assertEqual([t['id'] for t in r['results']], [a.id])
+        self.assertEqual(self.client.get('/api/task/changes/?since=nope').status_code, 400)
+
+    def test_fast_read_path_is_byte_compatible(self):
+        Task.objects.create(title='Ünïcode \u2028 "q"', description='a\nb\x01', status='completed', completed=True,
+                            completed_at=timezone.now().replace(microsecond=123456), category=self.cat, created_by=self.user)
+        Task.objects.create(title='B', priority=self.pri, created_by=self.user)
+        tasks = Task.objects.filter(created_by=self.user).order_by('-created_at', '-id')
+        expected = TaskSerializer(tasks, many=True).data
+        self.assertIsNotNone(row_serializer(TaskSerializer()))
+
+        r = self.client.get('/api/task/')
+        self.assertEqual(r.content, JSONRenderer().render({'next': None, 'previous': None, 'results': expected}))
+        r = self.client.get('/api/task/changes/')
+        self.assertEqual(r.json()['results'], list(reversed(json.loads(JSONRenderer().render(expected)))))
+        r = self.client.get('/api/task/export/')
+        encoder = JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+        self.assertEqual(b''.join(r.streaming_content).decode(), ''.join(encoder.encode(row) + '\n' for row in expected))
+
+    def test_purge_deleted_removes_expired_rows(self):
+        old = timezone.now() - timedelta(days=31)
+        gone = Task.objects.create(title='A', created_by=self.user, deleted=True, deleted_at=old)
+        recent = Task.objects.create(title='B', created_by=self.user, deleted=True, deleted_at=timezone.now())
+        cat = Category.objects.create(name='C2', created_by=self.user, deleted=True, deleted_at=old)
+        live = Task.objects.create(title='C', created_by=self.user, category=cat)
+        call_command('rebuild_task_counters', stdout=StringIO())
+
+        out = StringIO()
+        call_command('purge_deleted', '--dry-run', stdout=out)
+        self.assertIn('task=1, category=1, priority=0', out.getvalue())
+        self.assertTrue(Task.all_objects.filter(pk=gone.pk).exists())
+
+        call_command('purge_deleted', '--batch-size=1', '--sleep=0', '--archive', stdout=StringIO(), stderr=StringIO())
+        self.assertEqual(set(Task.all_objects.values_list('pk', flat=True)), {recent.pk, live.pk})
+        self.assertFalse(Category.all_objects.filter(pk=cat.pk).exists())
+        live.refresh_from_db()
+        self.assertIsNone(live.category_id)
+        self.assertEqual(self.client.get('/api/task/stats/').json()['category'], {'null': 1})
+        archived = {(a.model, a.object_id) for a in ArchivedRecord.objects.all()}
+        self.assertEqual(archived, {('api.task', gone.pk), ('api.category', cat.pk)})
+        self.assertEqual(ArchivedRecord.objects.get(model='api.task').data['title'], 'A')
+
+    def test_changes_rejects_cursor_older_than_retention(self):
+        cursor = sync.encode_cursor(timezone.now() - timedelta(days=31), 0)
+        self.assertEqual(self.client.get(f'/api/task/changes/?since={cursor}').status_code, 410)
+
+    def test_changes_rejects_cursor_without_timezone(self):
+        cursor = sync.encode_cursor(timezone.now().replace(tzinfo=None), 0)
+        self.assertEqual(self.client.get(f'/api/task/changes/?since={cursor}').status_code, 400)
+
+    def test_export_streams_filtered_ndjson_and_csv(self):
+        Task.objects.create(title='A', status='new', created_by=self.user)
+        Task.objects.create(title='B, "quoted"', status='new', created_by=self.user)
+        Task.objects.create(title='C', status='completed', created_by=self.user)
+        Task.objects.create(title='X', status='new', created_by=self.other)
+
+        r = self.client.get('/api/task/export/?status=new&ordering=created_at')
+        self.assertEqual(r['Content-Type'], 'application/x-ndjson')
+        lines = b''.join(r.streaming_content).decode().splitlines()
+        self.assertEqual([json.loads(line)['title'] for line in lines], ['A', 'B, "quoted"'])
+
+        r = self.client.get('/api/task/export/?output=csv&ordering=created_at')
+        rows = list(csv.DictReader(StringIO(b''.join(r.streaming_content).decode())))
+        self.assertEqual([row['title'] for row in rows], ['A', 'B, "quoted"', 'C'])
+        self.assertEqual(rows[0]['created_by'], str(self.user.id))
+
+    @override_settings(DATABASE_REPLICAS=['default'])
+    def test_reads_go_to_replica_until_the_user_writes(self):
+        clear_caches()
+        routed = []
+        db_for_read = PrimaryReplicaRouter.db_for_read
+
+        def spy(router, model, **hints):
+            routed.append(replica_reads_active())
+            return db_for_read(router, model, **hints)
+
+        with mock.patch.object(PrimaryReplicaRouter, 'db_for_read', spy):
+            self.client.get('/api/task/')
+            self.assertTrue(routed and all(routed))
+            routed.clear()
+            self.client.get('/api/task/changes/')
+            self.assertFalse(any(routed))
+            self.client.post('/api/task/', {'title': 'T'})
+            routed.clear()
+            self.client.get('/api/task/')
+            self.assertTrue(routed)
+            self.assertFalse(any(routed))
+            self.assertFalse(replica_reads_active())
+
+    @override_settings(DATABASE_REPLICAS=['default'])
+    def test_replica_flag_is_reset_when_the_view_raises(self):
+        with mock.patch.object(TaskViewSet, 'list', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                self.client.get('/api/task/')
+        self.assertFalse(replica_reads_active())
+
+
+@skipUnless(REPLICAS, 'set DB_REPLICAS to route reads to a real replica alias')
+@override_settings(DATABASE_REPLICAS=REPLICAS)
+class ReplicaRoutingTests(TransactionTestCase):
+    databases = {'default', *REPLICAS}
+
+    def setUp(self):
+        clear_caches()
+        self.user = User.objects.create_user(username='u1', password='pass')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        Task.objects.create(title='A', created_by=self.user)
+
+    def test_reads_use_the_replica_until_the_user_writes(self):
+        replica = connections[REPLICAS[0]]
+        with CaptureQueriesContext(replica) as replica_queries, CaptureQueriesContext(connection) as primary_queries:
+            self.assertEqual([t['title'] for t in self.client.get('/api/task/').json()['results']], ['A'])
+        self.assertTrue(replica_queries)
+        self.assertFalse(primary_queries)
+
+        self.client.post('/api/task/', {'title': 'B'})
+        with CaptureQueriesContext(replica) as replica_queries:
+            self.assertEqual([t['title'] for t in self.client.get('/api/task/').json()['results']], ['B', 'A'])
+        self.assertFalse(replica_queries)
+
+
+class TaskFilterTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        self.user = User.objects.create_user(username='u1', password='pass')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        now = timezone.now()
+        self.new = Task.objects.create(title='new', status='new', created_by=self.user)
+        self.doing = Task.objects.create(title='doing', status='in_progress', created_by=self.user)
+        self.done = Task.objects.create(title='done', status='completed', completed=True,
+                                        completed_at=now - timedelta(days=3), created_by=self.user)
+        Task.objects.filter(pk=self.new.pk).update(created_at=now - timedelta(days=10))
+        call_command('rebuild_task_counters', stdout=StringIO())
+
+    def titles(self, query):
+        r = self.client.get('/api/task/?' + query)
+        self.assertEqual(r.status_code, 200, r.content)
+        return sorted(t['title'] for t in r.json()['results'])
+
+    def test_filters(self):
+        self.assertEqual(self.titles('status__in=new,completed'), ['done', 'new'])
+        self.assertEqual(self.titles('completed=true'), ['done'])
+        self.assertEqual(self.titles('completed=false'), ['doing', 'new'])
+        week_ago = (timezone.now() - timedelta(days=7)).isoformat().replace('+', '%2B')
+        self.assertEqual(self.titles(f'created_at_after={week_ago}'), ['doing', 'done'])
+        self.assertEqual(self.titles(f'created_at_before={week_ago}'), ['new'])
+        self.assertEqual(self.titles(f'completed_at_after={week_ago}&status__in=completed'), ['done'])
+        self.assertEqual(self.client.get('/api/task/?created_at_after=yesterday').status_code, 400)
+
+    def test_presets(self):
+        r = self.client.post('/api/filter-presets/', {'name': 'open', 'params': {'status__in': 'new,in_progress'}}, format='json')
+        self.assertEqual(r.status_code, 201, r.content)
+        preset = r.json()['id']
+        self.assertEqual(self.titles(f'preset={preset}'), ['doing', 'new'])
+        # explicit parameters win over the preset's
+        self.assertEqual(self.titles(f'preset={preset}&status__in=completed'), ['done'])
+        # the preset, then one SUM over its counter rows
+        with self.assertNumQueries(2):
+            r = self.client.get(f'/api/filter-presets/{preset}/count/')
+        self.assertEqual(r.json(), {'count': 2, 'source': 'counters'})
+
+        r = self.client.post('/api/filter-presets/', {'name': 'recent done', 'params': {
+            'completed': 'true', 'completed_at_after': (timezone.now() - timedelta(days=7)).isoformat()}}, format='json')
+        self.assertEqual(self.client.get(f"/api/filter-presets/{r.json()['id']}/count/").json(), {'count': 1, 'source': 'query'})
+
+        for params in [{'deleted': 'true'}, {'completed_at_after': 'soon'}, {'status__in': ['new']}]:
+            r = self.client.post('/api/filter-presets/', {'name': 'bad', 'params': params}, format='json')
+            self.assertEqual(r.status_code, 400, params)
+        self.assertEqual(self.client.post('/api/filter-presets/', {'name': 'open', 'params': {}}, format='json').status_code, 400)
+
+        self.client.force_authenticate(User.objects.create_user(username='u2', password='pass'))
+        self.assertEqual(self.client.get(f'/api/task/?preset={preset}').status_code, 400)
+        self.assertEqual(self.client.get(f'/api/filter-presets/{preset}/count/').status_code, 404)
+
+    async def test_presets_on_the_async_list(self):
+        token = await Token.objects.acreate(user=self.user)
+        headers = {'Authorization': 'Token ' + token.key}
+        preset = await TaskFilterPreset.objects.acreate(user=self.user, name='open', params={'status__in': 'new,in_progress'})
+        r = await self.async_client.get(f'/api/async/task/?preset={preset.id}', headers=headers)
+        self.assertEqual(r.status_code, 200, r.content)
+        self.assertEqual(sorted(t['title'] for t in r.json()['results']), ['doing', 'new'])
+        r = await self.async_client.get(f'/api/async/task/?preset={preset.id + 1}', headers=headers)
+        self.assertEqual(r.status_code, 400)
+
+
+class IndexPlanTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='u1', password='pass')
+        if connection.vendor == 'postgresql':
+            # An empty table is always cheaper to scan; make the planner show its index choice.
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+
+    def assertUsesIndex(self, queryset, index_name):
+        self.assertIn(index_name, queryset.explain())
+
+    def test_task_hot_paths_use_partial_indexes(self):
+        tasks = Task.objects.filter(created_by=self.user)
+        self.assertUsesIndex(tasks.order_by('-created_at', '-id'), 'task_owner_created_idx')
+        self.assertUsesIndex(tasks.filter(status='new').order_by('-created_at', '-id'), 'task_owner_status_idx')
+        self.assertUsesIndex(tasks.filter(category=1), 'task_owner_category_idx')
+        self.assertUsesIndex(tasks.filter(priority=1), 'task_owner_priority_idx')
+        self.assertUsesIndex(tasks.filter(status__in=['new', 'completed']), 'task_owner_status_idx')
+        self.assertUsesIndex(tasks.filter(completed__in=[True]).order_by('-created_at', '-id'), 'task_owner_completed_idx')
+        self.assertUsesIndex(tasks.filter(completed_at__gte=timezone.now()), 'task_owner_completed_at_idx')
+        self.assertUsesIndex(tasks.filter(created_at__gte=timezone.now()).order_by('-created_at', '-id'), 'task_owner_created_idx')
+        self.assertUsesIndex(Task.objects.order_by('-created_at', '-id'), 'task_created_idx')
+        changes = Task.all_objects.filter(created_by=self.user, updated_at__gt=timezone.now()).order_by('updated_at', 'id')
+        self.assertUsesIndex(changes, 'task_owner_updated_idx')
+
+    def test_lookup_tables_use_partial_indexes(self):
+        self.assertUsesIndex(Category.objects.filter(created_by=self.user).order_by('-created_at', '-id'), 'category_owner_created_idx')
+        self.assertUsesIndex(Priority.objects.filter(created_by=self.user).order_by('-created_at', '-id'), 'priority_owner_created_idx')
+
+class AsyncReadTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        self.user = User.objects.create_user(username='u1', password='pass')
+        self.other = User.objects.create_user(username='u2', password='pass')
+        self.token = Token.objects.create(user=self.user)
+        self.cat = Category.objects.create(name='C1', created_by=self.user)
+        self.task = Task.objects.create(title='A', status='new', category=self.cat, created_by=self.user)
+        Task.objects.create(title='B', status='completed', created_by=self.user)
+        Task.objects.create(title='X', status='new', created_by=self.other)
+        call_command('rebuild_task_counters', stdout=StringIO())
+        self.sync_client = APIClient()
+        self.sync_client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+
+    def get(self, path):
+        return self.async_client.get(path, headers={'Authorization': 'Token ' + self.token.key})
+
+    async def test_async_list_matches_sync_list(self):
+        for query in ['', '?status=new', f'?category={self.cat.id}', '?ordering=status&page_size=1', '?search=A']:
+            r = await self.get('/api/async/task/' + query)
+            self.assertEqual(r.status_code, 200)
+            expected = await sync_to_async(self.sync_client.get)('/api/task/' + query)
+            self.assertEqual(r.json()['results'], expected.json()['results'])
+
+    async def test_async_retrieve_stats_and_categories(self):
+        r = await self.get(f'/api/async/task/{self.task.id}/')
+        self.assertEqual(r.json()['title'], 'A')
+        other = await Task.objects.aget(title='X')
+        self.assertEqual((await self.get(f'/api/async/task/{other.id}/')).status_code, 404)
+        self.assertEqual((await self.get('/api/async/task/stats/')).json()['total'], 2)
+        r = await self.get('/api/async/categories/')
+        self.assertEqual([c['name'] for c in r.json()['results']], ['C1'])
+
+    async def test_async_requires_token(self):
+        self.assertEqual((await self.async_client.get('/api/async/task/')).status_code, 401)
+        r = await self.async_client.get('/api/async/task/', headers={'Authorization': 'Token nope'})
+        self.assertEqual(r.status_code, 401)
+        self.assertEqual((await self.get('/api/async/task/?category=x')).status_code, 400)
+
+
+class EventStreamTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        self.user = User.objects.create_user(username='u1', password='pass')
+        self.token = Token.objects.create(user=self.user)
+
+    def open_stream(self):
+        return self.async_client.get('/api/events/', headers={'Authorization': 'Token ' + self.token.key})
+
+    def test_writes_publish_after_commit(self):
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        with mock.patch('api.events.LocalBroker.publish') as publish:
+            with self.captureOnCommitCallbacks(execute=True):
+                task = client.post('/api/task/', {'title': 'A'}).json()
+                self.assertFalse(publish.called)
+            with self.captureOnCommitCallbacks(execute=True):
+                client.patch(f"/api/task/{task['id']}/", {'title': 'B'})
+                client.delete(f"/api/task/{task['id']}/")
+                category = client.post('/api/categories/', {'name': 'C1'}).json()
+                client.post('/api/task/bulk/', [{'title': 'X'}, {'title': 'Y'}], format='json')
+        events_sent = [(user_id, e['type'], e['action'], len(e['ids'])) for (user_id, e), _ in publish.call_args_list]
+        self.assertEqual(events_sent, [
+            (self.user.pk, 'task', 'created', 1), (self.user.pk, 'task', 'updated', 1), (self.user.pk, 'task', 'deleted', 1),
+            (self.user.pk, 'category', 'created', 1), (self.user.pk, 'task', 'created', 2),
+        ])
+        self.assertEqual(publish.call_args_list[3][0][1]['ids'], [category['id']])
+
+    @override_settings(EVENTS_KEEPALIVE=0.05, EVENTS_STREAM_SECONDS=0.3)
+    async def test_stream_delivers_the_users_events(self):
+        response = await self.open_stream()
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        stream = aiter(response.streaming_content)
+        self.assertEqual(await anext(stream), b'retry: 3000\n\n')
+        broker = events.get_broker()
+        broker.publish(self.user.pk + 1, {'type': 'task', 'action': 'created', 'ids': [1]})
+        broker.publish(self.user.pk, {'type': 'category', 'action': 'deleted', 'ids': [2]})
+        self.assertEqual(
+            await anext(stream),
+            b'event: category\ndata: {"type": "category", "action": "deleted", "ids": [2]}\n\n',
+        )
+        # then keepalives until the stream times out and unsubscribes
+        self.assertEqual({chunk async for chunk in stream}, {b': keepalive\n\n'})
+        self.assertEqual(broker.connections(self.user.pk), 0)
+
+    @override_settings(EVENTS_BUFFER_SIZE=2, EVENTS_MAX_CONNECTIONS=1)
+    async def test_slow_consumer_is_cut_off(self):
+        stream = aiter((await self.open_stream()).streaming_content)
+        await anext(stream)
+        self.assertEqual((await self.open_stream()).status_code, 429)
+        for i in range(3):
+            events.get_broker().publish(self.user.pk, {'type': 'task', 'action': 'updated', 'ids': [i]})
+        self.assertEqual(await anext(stream), b'event: overflow\ndata: {}\n\n')
+        with self.assertRaises(StopAsyncIteration):
+            await anext(stream)
+        self.assertEqual(events.get_broker().connections(self.user.pk), 0)
+
+    async def test_redis_listener_survives_a_dropped_connection(self):
+        class Stop(BaseException):
+            pass
+
+        # Built around a mock client: redis is an optional dependency.
+        broker = events.RedisBroker.__new__(events.RedisBroker)
+        events.LocalBroker.__init__(broker)
+        broker.client, broker.reconnect_delay = mock.Mock(), 0
+        message = {'channel': f'api-events:{self.user.pk}'.encode(), 'data': b'{"type": "task"}'}
+        broker.client.pubsub.return_value.listen.side_effect = [ConnectionError('lost'), iter([message]), Stop()]
+        subscription = events.LocalBroker.subscribe(broker, self.user.pk)
+        with self.assertLogs('api.events') as logs, self.assertRaises(Stop):
+            await asyncio.to_thread(broker.listen)
+        self.assertIn('ConnectionError: lost', logs.output[0])
+        # the events missed while disconnected are reported as an overflow
+        self.assertIs(await subscription.get(), events.OVERFLOW)
+        self.assertEqual(await subscription.get(), {'type': 'task'})
+
+
+@WITHOUT_RESPONSE_CACHE
+class LookupCacheTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        self.user = User.objects.create_user(username='u1', password='pass')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.cat = Category.objects.create(name='C1', created_by=self.user)
+
+    def test_list_is_served_from_cache_until_a_write(self):
+        first = self.client.get('/api/categories/')
+        with self.assertNumQueries(0):
+            second = self.client.get('/api/categories/')
+        self.assertEqual(second.json(), first.json())
+        self.assertEqual(self.client.get('/api/categories/', HTTP_IF_NONE_MATCH=second['ETag']).status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/api/categories/', {'name': 'C0'})
+        self.assertEqual([c['name'] for c in self.client.get('/api/categories/').json()['results']], ['C0', 'C1'])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(f'/api/categories/{self.cat.id}/', {'name': 'C9'})
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(f'/api/categories/{self.cat.id}/')
+        self.assertEqual([c['name'] for c in self.client.get('/api/categories/').json()['results']], ['C0'])
+
+    def test_task_writes_validate_against_cached_ids(self):
+        r = self.client.post('/api/task/', {'title': 'T', 'category': self.cat.id})
+        self.assertEqual(r.status_code, 201)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(f'/api/categories/{self.cat.id}/')
+        r = self.client.post('/api/task/', {'title': 'T', 'category': self.cat.id})
+        self.assertEqual(r.status_code, 400)
+        self.assertEqual(self.client.post('/api/task/', {'title': 'T', 'category': 'x'}).status_code, 400)
+
+    def test_task_writes_accept_rows_the_cache_has_not_seen(self):
+        self.client.post('/api/task/', {'title': 'T', 'category': self.cat.id})
+        added = Category.objects.create(name='C2', created_by=self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            r = self.client.post('/api/task/', {'title': 'T', 'category': added.id})
+        self.assertEqual(r.status_code, 201, r.content)
+        self.assertIn(added.id, lookups.ids_for(Category, self.user.id))
+        other = Category.objects.create(name='X', created_by=User.objects.create_user(username='u2', password='pass'))
+        self.assertEqual(self.client.post('/api/task/', {'title': 'T', 'category': other.id}).status_code, 400)
+
+    def test_stats_endpoint_is_staff_only(self):
+        before = lookups.stats()
+        self.client.get('/api/categories/')
+        self.client.get('/api/categories/')
+        after = lookups.stats()
+        self.assertEqual(after['misses'] - before['misses'], 1)
+        self.assertEqual(after['hits'] - before['hits'], 1)
+        self.assertEqual(self.client.get('/api/lookup-cache/').status_code, 403)
+        self.client.force_authenticate(User.objects.create_user(username='admin', password='pass', is_staff=True))
+        self.assertEqual(set(self.client.get('/api/lookup-cache/').json()), {'hits', 'misses', 'invalidations'})
+
+
+@WITHOUT_RESPONSE_CACHE
+class MetricsTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        metrics.reset()
+        self.user = User.objects.create_user(username='u1', password='pass')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def scrape(self, **headers):
+        r = self.client.get('/metrics', **headers)
+        self.assertEqual(r.status_code, 200)
+        return r.content.decode()
+
+    def test_requests_are_labelled_by_viewset_action(self):
+        self.client.post('/api/task/', {'title': 'T'})
+        self.client.get('/api/task/')
+        self.client.get('/api/users/me/')
+        body = self.scrape()
+        self.assertIn('api_request_duration_seconds_count{route="TaskViewSet.list",method="GET",status="200"} 1', body)
+        self.assertIn('route="TaskViewSet.create",method="POST",status="201"', body)
+        self.assertIn('route="UserViewSet.me"', body)
+        # validators aggregate + page
+        self.assertIn('api_request_db_queries_bucket{route="TaskViewSet.list",le="2"} 1', body)
+        self.assertIn('api_request_db_queries_bucket{route="TaskViewSet.list",le="1"} 0', body)
+        self.assertIn('api_request_serializer_seconds_count{route="TaskViewSet.list"} 1', body)
+        self.assertIn('api_response_size_bytes_count{route="TaskViewSet.list"} 1', body)
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_scrape_token(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+        self.scrape(HTTP_AUTHORIZATION='Bearer secret')
+
+    def test_slow_request_log_includes_sql(self):
+        with self.assertNoLogs('api.slow_requests'):
+            self.client.get('/api/task/')
+        with override_settings(SLOW_REQUEST_SECONDS=0), self.assertLogs('api.slow_requests') as logs:
+            self.client.get('/api/task/')
+        self.assertIn('TaskViewSet.list', logs.output[0])
+        self.assertIn('api_task', logs.output[0])
+
+
+class ResponseCacheTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        self.user = User.objects.create_user(username='u1', password='pass')
+        self.other = User.objects.create_user(username='u2', password='pass')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.task = Task.objects.create(title='A', status='new', created_by=self.user)
+
+    def titles(self, path='/api/task/?status=new&ordering=-created_at'):
+        return [t['title'] for t in self.client.get(path).json()['results']]
+
+    def test_repeated_list_is_served_from_cache_with_normalized_params(self):
+        first = self.client.get('/api/task/?status=new&ordering=-created_at')
+        with self.assertNumQueries(0):
+            second = self.client.get('/api/task/?ordering=-created_at&status=new&search=')
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second['ETag'], first['ETag'])
+        with self.assertNumQueries(0):
+            r = self.client.get('/api/task/?status=new&ordering=-created_at', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(r.status_code, 304)
+
+    def test_writes_retire_the_users_responses(self):
+        self.client.get(f'/api/task/{self.task.id}/')
+        self.assertEqual(self.titles(), ['A'])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/api/task/', {'title': 'B'})
+        self.assertEqual(self.titles(), ['B', 'A'])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(f'/api/task/{self.task.id}/', {'title': 'A2'})
+        self.assertEqual(self.client.get(f'/api/task/{self.task.id}/').json()['title'], 'A2')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(f'/api/task/{self.task.id}/')
+        self.assertEqual(self.titles(), ['B'])
+        self.assertEqual(self.client.get(f'/api/task/{self.task.id}/').status_code, 404)
+
+        self.client.get('/api/categories/')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/api/categories/', {'name': 'C1'})
+        self.assertEqual([c['name'] for c in self.client.get('/api/categories/').json()['results']], ['C1'])
+
+    def test_cache_is_per_user(self):
+        self.titles()
+        self.client.force_authenticate(self.other)
+        self.assertEqual(self.titles(), [])
+
+    @mock.patch.object(ResponseCacheMixin, 'get_response_cache_key', return_value='k')
+    def test_concurrent_miss_waits_for_the_first_request(self, _):
+        responses = caches['responses']
+        first = self.client.get('/api/task/')
+        entry = responses.get('k')
+        responses.delete('k')
+        responses.add('k:lock', 1)
+
+        with mock.patch('api.responsecache.time.sleep', side_effect=lambda _: responses.set('k', entry)):
+            with self.assertNumQueries(0):
+                second = self.client.get('/api/task/')
+        self.assertEqual(second.content, first.content)
+
+        responses.delete('k')
+        responses.add('k:lock', 1)
+        # The holder gave up without storing anything: compute it here.
+        with mock.patch('api.responsecache.time.sleep', side_effect=lambda _: responses.delete('k:lock')):
+            self.assertEqual(self.client.get('/api/task/').content, first.content)
+
+
+THROTTLED = {
+    'DEFAULT_THROTTLE_CLASSES': ['api.throttling.TokenBucketThrottle'],
+    'DEFAULT_THROTTLE_RATES': {'cheap': '3/min', 'expensive': '2/min'},
+    'DEFAULT_PAGINATION_CLASS': 'api.pagination.KeysetPagination',
+    'PAGE_SIZE': 100,
+    'NUM_PROXIES': 0,
+}
+
+
+@override_settings(REST_FRAMEWORK=THROTTLED)
+class ThrottleTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        self.user = User.objects.create_user(username='u1', password='pass')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.task = Task.objects.create(title='A', created_by=self.user)
+
+    def test_buckets_are_per_scope_and_user(self):
+        for _ in range(2):
+            self.assertEqual(self.client.get('/api/task/').status_code, 200)
+        r = self.client.get('/api/task/')
+        self.assertEqual(r.status_code, 429)
+        self.assertEqual(r['Retry-After'], '30')
+        # retrieve draws from the cheap bucket, another user from their own
+        self.assertEqual(self.client.get(f'/api/task/{self.task.id}/').status_code, 200)
+        self.client.force_authenticate(User.objects.create_user(username='u2', password='pass'))
+        self.assertEqual(self.client.get('/api/task/').status_code, 200)
+
+    def test_bucket_refills(self):
+        with mock.patch('api.throttling.time.time', return_value=1000.0):
+            for _ in range(2):
+                self.client.get('/api/task/')
+            self.assertEqual(self.client.get('/api/task/').status_code, 429)
+        with mock.patch('api.throttling.time.time', return_value=1030.0):
+            self.assertEqual(self.client.get('/api/task/').status_code, 200)
+            self.assertEqual(self.client.get('/api/task/').status_code, 429)
+
+    def test_token_endpoint_is_limited_per_ip(self):
+        client = APIClient()
+        for i in range(2):
+            r = client.post('/api/token/', {'username': 'u1', 'password': 'wrong'}, HTTP_X_FORWARDED_FOR=f'10.0.0.{i}')
+            self.assertEqual(r.status_code, 400)
+        # A forged X-Forwarded-For does not buy a fresh bucket.
+        r = client.post('/api/token/', {'username': 'u1', 'password': 'pass'}, HTTP_X_FORWARDED_FOR='10.0.0.9')
+        self.assertEqual(r.status_code, 429)
+
+    @override_settings(THROTTLE_CONCURRENCY={'expensive': 1}, REST_FRAMEWORK={**THROTTLED, 'DEFAULT_THROTTLE_RATES': {}})
+    def test_concurrent_expensive_requests_are_capped(self):
+        self.assertEqual(self.client.get('/api/task/export/').status_code, 200)
+        caches['throttle'].set(f'inflight:expensive:{self.user.pk}', 1)
+        r = self.client.get('/api/task/')
+        self.assertEqual(r.status_code, 429)
+        self.assertEqual(r['Retry-After'], '1')
+        caches['throttle'].delete(f'inflight:expensive:{self.user.pk}')
+        response = self.client.get('/api/task/export/')
+        self.assertIsNotNone(caches['throttle'].get(f'inflight:expensive:{self.user.pk}'))
+        b''.join(response.streaming_content)
+        response.close()
+        self.assertIsNone(caches['throttle'].get(f'inflight:expensive:{self.user.pk}'))
+
+    @override_settings(THROTTLE_CONCURRENCY={'expensive': 1}, REST_FRAMEWORK={**THROTTLED, 'DEFAULT_THROTTLE_RATES': {}})
+    def test_uncaught_errors_release_the_slot(self):
+        with mock.patch.object(TaskViewSet, 'list', side_effect=RuntimeError):
+            for _ in range(2):
+                with self.assertRaises(RuntimeError):
+                    self.client.get('/api/task/')
+        self.assertEqual(self.client.get('/api/task/').status_code, 200)
+
+    async def test_async_routes_are_limited_and_keep_error_headers(self):
+        token = await Token.objects.acreate(user=self.user)
+        headers = {'Authorization': 'Token ' + token.key}
+        for _ in range(2):
+            self.assertEqual((await self.async_client.get('/api/async/task/', headers=headers)).status_code, 200)
+        r = await self.async_client.get('/api/async/task/', headers=headers)
+        self.assertEqual(r.status_code, 429)
+        self.assertEqual(r['Retry-After'], '30')
+        r = await self.async_client.get('/api/async/task/')
+        self.assertEqual(r.status_code, 401)
+        self.assertEqual(r['WWW-Authenticate'], 'Token')
+
+        key = f'inflight:expensive:{self.user.pk}'
+        with override_settings(THROTTLE_CONCURRENCY={'expensive': 1}, REST_FRAMEWORK={**THROTTLED, 'DEFAULT_THROTTLE_RATES': {}}):
+            self.assertEqual((await self.async_client.get('/api/async/task/', headers=headers)).status_code, 200)
+            self.assertIsNone(await caches['throttle'].aget(key))
+            await caches['throttle'].aset(key, 1)
+            self.assertEqual((await self.async_client.get('/api/async/task/', headers=headers)).status_code, 429)
+
+
+class PasswordHashingTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        self.client = APIClient()
+
+    def test_login_rehashes_with_current_work_factor(self):
+        with override_settings(PASSWORD_PBKDF2_ITERATIONS=1000):
+            user = User.objects.create_user(username='u1', password='pass')
+        self.assertTrue(user.password.startswith('pbkdf2_sha256$1000$'))
+        with override_settings(PASSWORD_PBKDF2_ITERATIONS=2000):
+            self.assertEqual(self.client.post('/api/token/', {'username': 'u1', 'password': 'pass'}).status_code, 200)
+        user.refresh_from_db()
+        self.assertTrue(user.password.startswith('pbkdf2_sha256$2000$'))
+
+    @override_settings(PASSWORD_PBKDF2_ITERATIONS=1000, PASSWORD_HASH_WORKERS=1, PASSWORD_HASH_QUEUE=0)
+    def test_full_hashing_queue_returns_503(self):
+        User.objects.create_user(username='u1', password='pass')
+        _, slots = hashers._executor()
+        slots.acquire()
+        try:
+            r = self.client.post('/api/token/', {'username': 'u1', 'password': 'pass'})
+        finally:
+            slots.release()
+        self.assertEqual(r.status_code, 503)
+        self.assertEqual(r['Retry-After'], '1')
+        self.assertEqual(self.client.post('/api/token/', {'username': 'u1', 'password': 'pass'}).status_code, 200)
+
+    @override_settings(PASSWORD_PBKDF2_ITERATIONS=1000, PASSWORD_HASH_WORKERS=1, PASSWORD_HASH_QUEUE=0)
+    def test_admin_login_with_full_hashing_queue_returns_503(self):
+        User.objects.create_user(username='admin', password='pass', is_staff=True)
+        _, slots = hashers._executor()
+        slots.acquire()
+        try:
+            r = self.client.post('/admin/login/', {'username': 'admin', 'password': 'pass'})
+        finally:
+            slots.release()
+        self.assertEqual(r.status_code, 503)
+        self.assertEqual(r['Retry-After'], '1')
+
+    @override_settings(PASSWORD_HASH_WORKERS=1, PASSWORD_HASH_QUEUE=0)
+    def test_login_holds_one_slot_through_the_rehash(self):
+        with override_settings(PASSWORD_PBKDF2_ITERATIONS=1000):
+            User.objects.create_user(username='u1', password='pass')
+        _, slots = hashers._executor()
+        with override_settings(PASSWORD_PBKDF2_ITERATIONS=2000), \
+                mock.patch.object(slots, 'acquire', wraps=slots.acquire) as acquire:
+            self.assertEqual(self.client.post('/api/token/', {'username': 'u1', 'password': 'pass'}).status_code, 200)
+        self.assertEqual(acquire.call_count, 1)
+        self.assertTrue(User.objects.get(username='u1').password.startswith('pbkdf2_sha256$2000$'))
+
+
+class StartupTests(TestCase):
+    def test_schema_is_generated_once(self):
+        from drf_yasg.generators import OpenAPISchemaGenerator
+
+        with mock.patch.object(OpenAPISchemaGenerator, 'get_schema', autospec=True,
+                               side_effect=OpenAPISchemaGenerator.get_schema) as get_schema:
+            first = self.client.get('/swagger/?format=openapi')
+            second = self.client.get('/swagger/?format=openapi')
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(second.content, first.content)
+        self.assertIn('/task/', first.json()['paths'])
+        self.assertEqual(get_schema.call_count, 1)
+        self.assertEqual(self.client.get('/redoc/').status_code, 200)
+
+    def test_importtime_report(self):
+        out = StringIO()
+        call_command('importtime_report', runs=1, top=3, stdout=out)
+        report = json.loads(out.getvalue())
+        self.assertGreater(report['import_ms'], 0)
+        self.assertEqual(len(report['packages']), 3)
+        self.assertIn('django', [p['name'] for p in report['packages']])
+
+
+def make_tasks(user, count, category=None, priority=None):
+    Task.objects.bulk_create(
+        (Task(title=f'T{i}', status=['new', 'in_progress', 'completed'][i % 3], created_by=user,
+              category=category, priority=priority) for i in range(count)),
+        batch_size=5000,
+    )
+
+
+class QueryCountTests(TestCase):
+    """Hot-path query budgets; a regression here shows up as an extra query per request or per row."""
+
+    def setUp(self):
+        clear_caches()
+        self.user = User.objects.create_user(username='u1', password='pass')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.cat = Category.objects.create(name='C1', created_by=self.user)
+        self.pri = Priority.objects.create(name='P1', created_by=self.user)
+        make_tasks(self.user, 10, self.cat, self.pri)
+        self.task = Task.objects.first()
+        # Counter rows exist in steady state; writes below take the single-UPDATE path.
+        call_command('rebuild_task_counters', stdout=StringIO())
+
+    def test_list_does_not_query_per_row(self):
+        # validators aggregate + page
+        with self.assertNumQueries(2):
+            self.client.get('/api/task/')
+        make_tasks(self.user, 90, self.cat, self.pri)
+        with self.assertNumQueries(2):
+            self.client.get('/api/task/?page_size=100')
+
+    def test_retrieve(self):
+        with self.assertNumQueries(1):
+            self.client.get(f'/api/task/{self.task.id}/')
+
+    def test_create(self):
+        # category + priority validation fill the lookup cache, savepoint, insert, counters, release
+        with self.assertNumQueries(6):
+            r = self.client.post('/api/task/', {'title': 'x', 'category': self.cat.id, 'priority': self.pri.id})
+        self.assertEqual(r.status_code, 201)
+        # warm: validation is answered from the cache
+        with self.assertNumQueries(4):
+            r = self.client.post('/api/task/', {'title': 'y', 'category': self.cat.id, 'priority': self.pri.id})
+        self.assertEqual(r.status_code, 201)
+
+    def test_update(self):
+        # fetch, savepoint, update, counters, release
+        with self.assertNumQueries(5):
+            r = self.client.patch(f'/api/task/{self.task.id}/', {'status': 'completed'})
+        self.assertEqual(r.status_code, 200)
+
+    def test_update_writes_only_changed_columns(self):
+        before = self.task.updated_at
+        # fetch + category validation filling the lookup cache; nothing changed, nothing written
+        with self.assertNumQueries(2):
+            r = self.client.patch(f'/api/task/{self.task.id}/', {'title': self.task.title, 'category': self.cat.id})
+        self.assertEqual(r.status_code, 200)
+        self.task.refresh_from_db()
+        self.assertEqual(self.task.updated_at, before)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.client.patch(f'/api/task/{self.task.id}/', {'title': 'renamed'})
+        update, = [q['sql'] for q in queries if q['sql'].startswith('UPDATE "api_task"')]
+        self.assertIn('"title"', update)
+        self.assertIn('"updated_at"', update)
+        self.assertNotIn('"description"', update)
+        self.assertNotIn('"status"', update)
+
+        r = self.client.patch(f'/api/task/{self.task.id}/', {'completed': True})
+        self.assertIsNotNone(r.json()['completed_at'])
+        r = self.client.patch(f'/api/task/{self.task.id}/', {'completed': False})
+        self.assertIsNone(r.json()['completed_at'])
+
+    def test_bulk_update_skips_unchanged_tasks(self):
+        first, second = Task.objects.order_by('id')[:2]
+        with CaptureQueriesContext(connection) as queries:
+            r = self.client.patch('/api/task/bulk/', [
+                {'id': first.id, 'title': 'changed'}, {'id': second.id, 'title': second.title},
+            ], format='json')
+        self.assertEqual(r.status_code, 200)
+        update, = [q['sql'] for q in queries if q['sql'].startswith('UPDATE "api_task"')]
+        self.assertNotIn(f'"id" = {second.id}', update)
+        self.assertNotIn('"status"', update)
+        self.assertEqual(Task.objects.get(pk=second.pk).updated_at, second.updated_at)
+        self.assertEqual(Task.objects.get(pk=first.pk).title, 'changed')
+
+    def test_foreign_keys_are_scoped_to_owner(self):
+        other = User.objects.create_user(username='u2', password='pass')
+        theirs = Category.objects.create(name='C1', created_by=other)
+        r = self.client.post('/api/task/', {'title': 'x', 'category': theirs.id})
+        self.assertEqual(r.status_code, 400)
+
+
+class LoadDataTests(TestCase):
+    def setUp(self):
+        clear_caches()
+
+    def test_generate_data_and_benchmark(self):
+        call_command('generate_data', users=5, tasks=20, deleted=0.2, seed=1, password='pw', stdout=StringIO(), stderr=StringIO())
+        users = User.objects.filter(username__startswith='load-')
+        self.assertEqual(users.count(), 5)
+        self.assertTrue(users[0].check_password('pw'))
+        tasks = Task.all_objects.filter(created_by__in=users)
+        self.assertGreater(tasks.filter(deleted=True).count(), 0)
+        self.assertGreater(tasks.filter(deleted=False).count(), 0)
+        self.assertFalse(Task.objects.exclude(category=None).exclude(category__created_by=F('created_by')).exists())
+        out = StringIO()
+        call_command('rebuild_task_counters', dry_run=True, stdout=out)
+        self.assertIn('0 drifted', out.getvalue())
+        with self.assertRaises(CommandError):
+            call_command('generate_data', users=1, stdout=StringIO(), stderr=StringIO())
+
+        out = StringIO()
+        call_command('benchmark_api', requests=3, warmup=1, password='pw', host='testserver', stdout=out, stderr=StringIO())
+        report = json.loads(out.getvalue())
+        self.assertEqual(report['dataset']['users'], 5)
+        self.assertEqual(set(report['routes']), {'task-list', 'category-list', 'users-me', 'token'})
+        for result in report['routes'].values():
+            self.assertEqual(result['statuses'], {'200': 3})
+        self.assertGreater(report['routes']['task-list']['queries_p50'], 0)
+
+
+@skipUnless(os.environ.get('API_BENCHMARK'), 'set API_BENCHMARK=1 to run the benchmarks')
+@WITHOUT_RESPONSE_CACHE
+class BenchmarkTests(TestCase):
+    """
+    Times list, retrieve, create and update against 10/1k/100k tasks owned by one
+    user (override with API_BENCHMARK_SIZES=10,1000) and prints the median of
+    API_BENCHMARK_REPEAT runs together with the query count. The response cache
+    is off so every repeat does the full work rather than timing cache hits.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='bench', password='pass')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.cat = Category.objects.create(name='C1', created_by=self.user)
+        self.pri = Priority.objects.create(name='P1', created_by=self.user)
+
+    def measure(self, request):
+        timings = []
+        for i in range(int(os.environ.get('API_BENCHMARK_REPEAT', 5))):
+            with CaptureQueriesContext(connection) as queries:
+                start = time.perf_counter()
+                response = request(i)
+                timings.append(time.perf_counter() - start)
+            self.assertLess(response.status_code, 300)
+        return sorted(timings)[len(timings) // 2] * 1000, len(queries)
+
+    def test_hot_paths(self):
+        sizes = [int(n) for n in os.environ.get('API_BENCHMARK_SIZES', '10,1000,100000').split(',')]
+        for size in sizes:
+            make_tasks(self.user, size - Task.objects.count(), self.cat, self.pri)
+            call_command('rebuild_task_counters', stdout=StringIO())
+            task = Task.objects.filter(created_by=self.user).first()
+            for name, request in [
+                ('list', lambda i: self.client.get('/api/task/')),
+                ('retrieve', lambda i: self.client.get(f'/api/task/{task.id}/')),
+                ('create', lambda i: self.client.post('/api/task/', {'title': 'x', 'category': self.cat.id})),
+                # A new title each repeat, so the PATCH is never an unchanged no-op.
+                ('update', lambda i: self.client.patch(f'/api/task/{task.id}/', {'title': f'y{size}-{i}'})),
+            ]:
+                ms, queries = self.measure(request)
+                print(f'\n{name:>8} rows={size:<7} {ms:8.2f} ms {queries} queries', end='')
+
+    def test_serializer_paths(self):
+        """ModelSerializer + JSONRenderer against RowSerializer + ORJSONRenderer (API_BENCHMARK_ROWS=1000,10000,100000)."""
+        rows = row_serializer(TaskSerializer())
+        for size in [int(n) for n in os.environ.get('API_BENCHMARK_ROWS', '1000,10000,100000').split(',')]:
+            make_tasks(self.user, size - Task.objects.count(), self.cat, self.pri)
+            tasks = Task.objects.filter(created_by=self.user).order_by('-created_at', '-id')
+            results = {}
+            for name, render in [
+                ('model', lambda: JSONRenderer().render(TaskSerializer(list(tasks), many=True).data)),
+                ('rows', lambda: ORJSONRenderer().render(rows.many(rows.values(tasks)))),
+            ]:
+                timings = []
+                for _ in range(int(os.environ.get('API_BENCHMARK_REPEAT', 5))):
+                    start = time.perf_counter()
+                    results[name] = render()
+                    timings.append(time.perf_counter() - start)
+                ms = sorted(timings)[len(timings) // 2] * 1000
+                print(f'\n{name:>8} rows={size:<7} {ms:8.2f} ms', end='')
+            self.assertEqual(results['rows'], results['model'])
@@ -0,0 +1,213 @@
+"""
+Token-bucket rate limits and in-flight caps per user (or client IP) and scope.
+
+A view maps its actions to a scope with ``throttle_scopes`` (``throttle_scope``
+is the fallback, ``"cheap"`` the default); rates come from
+``DEFAULT_THROTTLE_RATES`` in DRF's ``"<n>/<period>"`` format, read as a bucket
+of ``n`` tokens refilled over ``period``. ``THROTTLE_CONCURRENCY`` caps the
+requests of a scope one user may have in flight.
+
+State lives in the ``throttle`` cache of this process, or in Redis when
+THROTTLE_REDIS_URL is set so that every node shares the same buckets.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+from rest_framework.exceptions import Throttled
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+
+DEFAULT_SCOPE = "cheap"
+
+# Leaked in-flight slots (a worker killed mid-request) expire after this long.
+SLOT_TIMEOUT = 300
+
+
+def get_scope(view):
+    scopes = getattr(view, "throttle_scopes", {})
+    return scopes.get(getattr(view, "action", None), getattr(view, "throttle_scope", None) or DEFAULT_SCOPE)
+
+
+def get_rate(scope):
+    """``(capacity, tokens per second)`` for ``scope``, or ``None`` if it is not limited."""
+    rate = api_settings.DEFAULT_THROTTLE_RATES.get(scope)
+    if rate is None:
+        return None
+    num, period = rate.split("/")
+    duration = {"s": 1, "m": 60, "h": 3600, "d": 86400}[period[0]]
+    return int(num), int(num) / duration
+
+
+class LocalStore:
+    """Buckets and slot counters in a local-memory cache, updated under a process lock."""
+
+    def __init__(self):
+        self.cache = caches["throttle"]
+        self.lock = threading.Lock()
+
+    def take(self, key, capacity, rate):
+        with self.lock:
+            now = time.time()
+            tokens, stamp = self.cache.get(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - stamp) * rate)
+            wait = 0.0
+            if tokens >= 1:
+                tokens -= 1
+            else:
+                wait = (1 - tokens) / rate
+            self.cache.set(key, (tokens, now), capacity / rate + 1)
+            return wait
+
+    def acquire(self, key, limit):
+        with self.lock:
+            count = self.cache.get(key, 0)
+            if count >= limit:
+                return False
+            self.cache.set(key, count + 1, SLOT_TIMEOUT)
+            return True
+
+    def release(self, key):
+        with self.lock:
+            count = self.cache.get(key, 0)
+            if count > 1:
+                self.cache.set(key, count - 1, SLOT_TIMEOUT)
+            else:
+                self.cache.delete(key)
+
+
+class RedisStore:
+    """The same operations as Lua scripts, atomic across nodes and timed by the Redis clock."""
+
+    TAKE = """
+        local capacity, rate = tonumber(ARGV[1]), tonumber(ARGV[2])
+        local clock = redis.call('TIME')
+        local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+        local state = redis.call('HMGET', KEYS[1], 'tokens', 'stamp')
+        local tokens = math.min(capacity, (tonumber(state[1]) or capacity) + (now - (tonumber(state[2]) or now)) * rate)
+        local wait = 0
+        if tokens >= 1 then tokens = tokens - 1 else wait = (1 - tokens) / rate end
+        redis.call('HSET', KEYS[1], 'tokens', tokens, 'stamp', now)
+        redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+        return tostring(wait)
+    """
+    ACQUIRE = """
+        local count = redis.call('INCR', KEYS[1])
+        redis.call('EXPIRE', KEYS[1], ARGV[2])
+        if count > tonumber(ARGV[1]) then redis.call('DECR', KEYS[1]) return 0 end
+        return 1
+    """
+    # Never below zero: a slot released after its key expired must not hand the
+    # next request a negative count (and so an extra slot).
+    RELEASE = """
+        local count = tonumber(redis.call('GET', KEYS[1]) or '0')
+        if count > 1 then redis.call('DECR', KEYS[1]) else redis.call('DEL', KEYS[1]) end
+    """
+
+    def __init__(self, url):
+        import redis
+
+        self.client = redis.Redis.from_url(url)
+        self.take_script = self.client.register_script(self.TAKE)
+        self.acquire_script = self.client.register_script(self.ACQUIRE)
+        self.release_script = self.client.register_script(self.RELEASE)
+
+    def take(self, key, capacity, rate):
+        return float(self.take_script(keys=[key], args=[capacity, rate]))
+
+    def acquire(self, key, limit):
+        return bool(self.acquire_script(keys=[key], args=[limit, SLOT_TIMEOUT]))
+
+    def release(self, key):
+        self.release_script(keys=[key])
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                url = getattr(settings, "THROTTLE_REDIS_URL", None)
+                _store = RedisStore(url) if url else LocalStore()
+    return _store
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """Per user (or client IP) token bucket for the view's scope."""
+
+    def allow_request(self, request, view):
+        scope = get_scope(view)
+        rate = get_rate(scope)
+        if rate is None:
+            return True
+        ident = request.user.pk if request.user and request.user.is_authenticated else self.get_ident(request)
+        self.wait_seconds = get_store().take(f"throttle:{scope}:{ident}", *rate)
+        return self.wait_seconds == 0
+
+    def wait(self):
+        return self.wait_seconds
+
+
+def acquire_slot(request, scope):
+    """
+    Take one of the user's THROTTLE_CONCURRENCY in-flight slots for ``scope``;
+    returns the key to ``release_slot``, or ``None`` if the scope is not capped.
+    """
+    limit = getattr(settings, "THROTTLE_CONCURRENCY", {}).get(scope)
+    if limit is None or not request.user.is_authenticated:
+        return None
+    key = f"inflight:{scope}:{request.user.pk}"
+    if not get_store().acquire(key, limit):
+        raise Throttled(wait=1, detail=f"Too many concurrent {scope} requests.")
+    return key
+
+
+def release_slot(key):
+    get_store().release(key)
+
+
+class ConcurrencyLimitMixin:
+    """
+    Rejects a request with 429 while the user already has THROTTLE_CONCURRENCY
+    requests of the view's scope in flight; the slot is held until dispatch
+    returns or raises, or until a streaming response has been sent.
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        self._inflight_key = response = None
+        try:
+            response = super().dispatch(request, *args, **kwargs)
+            return response
+        finally:
+            key, self._inflight_key = self._inflight_key, None
+            if key is not None:
+                if response is not None and response.streaming:
+                    response.streaming_content = _ReleaseOnClose(response.streaming_content, key)
+                else:
+                    release_slot(key)
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self._inflight_key = acquire_slot(request, get_scope(self))
+
+
+class _ReleaseOnClose:
+    """Streaming content that frees its in-flight slot when the server closes the response."""
+
+    def __init__(self, content, key):
+        self.content, self.key = content, key
+
+    def __iter__(self):
+        return iter(self.content)
+
+    def close(self):
+        if self.key is not None:
+            release_slot(self.key)
+            self.key = None
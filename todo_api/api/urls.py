@@ -1,6 +1,7 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import TaskViewSet, CategoryViewSet, PriorityViewSet, UserViewSet
+from . import async_views
+from .views import TaskViewSet, CategoryViewSet, PriorityViewSet, TaskFilterPresetViewSet, UserViewSet, LookupCacheStatsView
 
 
 router = DefaultRouter()
@@ -8,7 +9,22 @@ router.register(r'task', TaskViewSet, basename='task')
 router.register(r'categories', CategoryViewSet, basename="category")
 router.register(r'priorities', PriorityViewSet, basename="priority")
 router.register(r'users', UserViewSet, basename='user')
+router.register(r'filter-presets', TaskFilterPresetViewSet, basename='filter-preset')
+
+# Async (ASGI) read-only mirrors of the hot GET endpoints.
+async_urlpatterns = [
+    path('task/', async_views.task_list, name='async-task-list'),
+    path('task/stats/', async_views.task_stats, name='async-task-stats'),
+    path('task/<int:pk>/', async_views.task_detail, name='async-task-detail'),
+    path('categories/', async_views.category_list, name='async-category-list'),
+    path('categories/<int:pk>/', async_views.category_detail, name='async-category-detail'),
+    path('priorities/', async_views.priority_list, name='async-priority-list'),
+    path('priorities/<int:pk>/', async_views.priority_detail, name='async-priority-detail'),
+]
 
 urlpatterns = [
+    path('async/', include(async_urlpatterns)),
+    path('events/', async_views.event_stream, name='events'),
+    path('lookup-cache/', LookupCacheStatsView.as_view(), name='lookup-cache-stats'),
     path('', include(router.urls)),
 ]
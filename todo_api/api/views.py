@@ -1,15 +1,29 @@
 from django.contrib.auth.models import User
+from django.db import transaction
+from django.http import StreamingHttpResponse
 from django.utils import timezone
 
-from rest_framework import viewsets, permissions, filters, status
+from rest_framework import viewsets, permissions, filters, renderers, status
+from rest_framework.authtoken.views import ObtainAuthToken
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from rest_framework.authtoken.models import Token
-
-from django_filters.rest_framework import DjangoFilterBackend
-
-from .models import Task, Category, Priority
-from .serializers import TaskSerializer, CategorySerializer, PrioritySerializer, UserSerializer
+from rest_framework.views import APIView
+
+from . import counters, events, lookups, responsecache, sync
+from .authentication import revoke_tokens
+from .conditional import ConditionalGetMixin
+from .export import batched, csv_lines, ndjson_lines
+from .fastpath import RowListMixin
+from .filters import TaskFilter, TaskFilterBackend, load_preset
+from .hashers import hashing_slot
+from .lookups import LookupCacheMixin
+from .models import Task, Category, Priority, TaskFilterPreset
+from .renderers import ORJSONRenderer
+from .responsecache import ResponseCacheMixin
+from .routers import ReplicaReadsMixin
+from .search import TaskSearchFilter
+from .serializers import TaskSerializer, CategorySerializer, PrioritySerializer, TaskFilterPresetSerializer, UserSerializer
+from .throttling import ConcurrencyLimitMixin, TokenBucketThrottle
 
 
 class IsOwnerOrAdmin(permissions.BasePermission):
@@ -22,17 +36,38 @@ class IsOwnerOrAdmin(permissions.BasePermission):
     def has_object_permission(self, request, view, obj):
         if request.user and request.user.is_staff:
             return True
-        owner = getattr(obj, "created_by", None)
-        if owner is not None:
-            return owner == request.user
+        # Compare ids: reading obj.created_by would load the User row.
+        owner_id = getattr(obj, "created_by_id", None)
+        if owner_id is not None:
+            return owner_id == request.user.pk
         if isinstance(obj, User):
             return obj == request.user
         return False
 
 
-class UserViewSet(viewsets.ModelViewSet):
+def detach_tasks(field, pk):
+    """
+    Clear ``field`` on the tasks of a category/priority about to be hard-deleted.
+    Doing the FK's SET_NULL here bumps ``updated_at``, so delta sync and the change
+    stream report the tasks; their counts move to the "null" bucket.
+    """
+    tasks = Task.all_objects.filter(**{field: pk})
+    ids = {}
+    for task_id, owner_id in tasks.values_list("pk", "created_by_id"):
+        ids.setdefault(owner_id, []).append(task_id)
+    tasks.update(**{field: None, "updated_at": timezone.now()})
+    counters.reassign_to_null(field, pk)
+    for owner_id, task_ids in ids.items():
+        responsecache.bump(owner_id)
+        events.publish(owner_id, "task", "updated", task_ids)
+
+
+class UserViewSet(ConcurrencyLimitMixin, viewsets.ModelViewSet):
     queryset = User.objects.all()
     serializer_class = UserSerializer
+    ordering = ["-date_joined"]
+    # Password hashing is deliberately slow.
+    throttle_scopes = {"create": "expensive", "change_password": "expensive", "reset_password": "expensive", "list": "expensive"}
 
     def get_permissions(self):
 
@@ -60,7 +95,7 @@ class UserViewSet(viewsets.ModelViewSet):
         elif request.method.lower() == "delete":
             user.is_active = False
             user.save(update_fields=["is_active"])
-            Token.objects.filter(user=user).delete()
+            revoke_tokens(user)
             return Response({"detail": "Account deactivated"}, status=status.HTTP_200_OK)
 
     @action(detail=False, methods=["post"])
@@ -70,16 +105,17 @@ class UserViewSet(viewsets.ModelViewSet):
         new_password = request.data.get("new_password")
         if not old_password or not new_password:
             return Response({"detail": "old_password and new_password are required"}, status=status.HTTP_400_BAD_REQUEST)
-        if not user.check_password(old_password):
-            return Response({"detail": "Old password is incorrect"}, status=status.HTTP_400_BAD_REQUEST)
-        user.set_password(new_password)
+        with hashing_slot():
+            if not user.check_password(old_password):
+                return Response({"detail": "Old password is incorrect"}, status=status.HTTP_400_BAD_REQUEST)
+            user.set_password(new_password)
         user.save()
-        Token.objects.filter(user=user).delete()
+        revoke_tokens(user)
         return Response({"detail": "Password changed. Please login again."}, status=status.HTTP_200_OK)
 
     @action(detail=False, methods=["post"])
     def logout(self, request):
-        Token.objects.filter(user=request.user).delete()
+        revoke_tokens(request.user)
         return Response({"detail": "Logged out"}, status=status.HTTP_200_OK)
 
     @action(detail=False, methods=["post"], permission_classes=[permissions.IsAdminUser])
@@ -94,27 +130,44 @@ class UserViewSet(viewsets.ModelViewSet):
             return Response({"detail": "User not found"}, status=status.HTTP_404_NOT_FOUND)
         user.set_password(new_password)
         user.save()
-        Token.objects.filter(user=user).delete()
+        revoke_tokens(user)
         return Response({"detail": "Password reset"}, status=status.HTTP_200_OK)
 
 
-class TaskViewSet(viewsets.ModelViewSet):
+class TaskViewSet(ReplicaReadsMixin, ConcurrencyLimitMixin, ResponseCacheMixin, ConditionalGetMixin, RowListMixin, viewsets.ModelViewSet):
     serializer_class = TaskSerializer
     permission_classes = [permissions.IsAuthenticated, IsOwnerOrAdmin]
-    filter_backends = [DjangoFilterBackend, filters.OrderingFilter, filters.SearchFilter]
-    filterset_fields = ["status", "category", "priority"]
+    filter_backends = [TaskFilterBackend, filters.OrderingFilter, TaskSearchFilter]
+    renderer_classes = [ORJSONRenderer, renderers.BrowsableAPIRenderer]
+    filterset_class = TaskFilter
     ordering_fields = ["created_at", "status"]
+    ordering = ["-created_at"]
     search_fields = ["title", "description", "status"]
+    bulk_max_items = 500
+    changes_page_size = 500
+    changes_max_page_size = 1000
+    export_chunk_size = 2000
+    replica_actions = ("list", "retrieve", "stats", "export")
+    throttle_scopes = {"list": "expensive", "export": "expensive", "changes": "expensive", "bulk": "expensive"}
 
     def get_queryset(self):
-
+        if getattr(self, "swagger_fake_view", False):
+            return Task.objects.none()
         if self.request.user.is_staff:
             return Task.objects.all()
         return Task.objects.filter(created_by=self.request.user)
 
+    def filter_queryset(self, queryset):
+        # TaskFilter gets the ?preset= parameters from here (TaskFilterBackend) so that
+        # building it runs no query; the async list view sets them with aload_preset.
+        if not hasattr(self, "preset_params"):
+            self.preset_params = load_preset(self.request)
+        return super().filter_queryset(queryset)
+
     def perform_create(self, serializer):
         serializer.save(created_by=self.request.user)
 
+    @transaction.atomic
     def perform_destroy(self, instance):
 
         if self.request.user.is_staff:
@@ -122,52 +175,265 @@ class TaskViewSet(viewsets.ModelViewSet):
         else:
             instance.deleted = True
             instance.deleted_at = timezone.now()
-            instance.save(update_fields=["deleted", "deleted_at"])
+            instance.save(update_fields=["deleted", "deleted_at", "updated_at"])
+        counters.record(instance.created_by_id, old=counters.task_keys(instance))
+        responsecache.bump(instance.created_by_id)
+        events.publish(instance.created_by_id, "task", "deleted", [instance.pk])
+
+    @action(detail=False, methods=["post", "patch", "delete"])
+    def bulk(self, request):
+        """
+        POST a list of tasks, PATCH a list of partial tasks carrying their ``id``, or
+        DELETE (soft) a list of ids. The batch is written in one transaction or not at
+        all; a 400 response carries one error entry per input item. PATCHed tasks
+        that end up unchanged are not written.
+        """
+        items = request.data
+        if not isinstance(items, list) or not items:
+            return Response({"detail": "Expected a non-empty list"}, status=status.HTTP_400_BAD_REQUEST)
+        if len(items) > self.bulk_max_items:
+            return Response({"detail": f"At most {self.bulk_max_items} items per request"}, status=status.HTTP_400_BAD_REQUEST)
+
+        if request.method.lower() == "post":
+            ser = self.get_serializer(data=items, many=True)
+            ser.is_valid(raise_exception=True)
+            ser.save(created_by=request.user)
+            return Response(ser.data, status=status.HTTP_201_CREATED)
+
+        with transaction.atomic():
+            ids = [item.get("id") if isinstance(item, dict) else item for item in items]
+            tasks, errors = self.get_bulk_instances(ids)
+            if any(errors):
+                return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+
+            if request.method.lower() == "patch":
+                ser = self.get_serializer(tasks, data=items, many=True, partial=True)
+                ser.is_valid(raise_exception=True)
+                ser.save()
+                return Response(ser.data)
+
+            now = timezone.now()
+            Task.objects.filter(pk__in=[task.pk for task in tasks]).update(deleted=True, deleted_at=now, updated_at=now)
+            counters.record_many((task.created_by_id, counters.task_keys(task), None) for task in tasks)
+            responsecache.bump(*{task.created_by_id for task in tasks})
+            events.publish_tasks("deleted", tasks)
+            return Response({"deleted": len(tasks)}, status=status.HTTP_200_OK)
+
+    def get_bulk_instances(self, ids):
+        """Locked tasks for ``ids`` in input order, plus a per-item error list."""
+        pks = []
+        for pk in ids:
+            try:
+                pks.append(int(pk))
+            except (TypeError, ValueError):
+                pks.append(None)
+        found = self.get_queryset().select_for_update().in_bulk([pk for pk in pks if pk is not None])
+
+        tasks, errors, seen = [], [], set()
+        for pk in pks:
+            if pk not in found:
+                errors.append({"id": ["Not found."]})
+            elif pk in seen:
+                errors.append({"id": ["Duplicate id."]})
+            else:
+                errors.append({})
+                tasks.append(found[pk])
+            seen.add(pk)
+        return tasks, errors
+
+    @action(detail=False, methods=["get"])
+    def changes(self, request):
+        """
+        Tasks changed after ``?since=<cursor>`` ordered by ``updated_at``, including
+        soft-deleted ones (``deleted: true``). Follow ``cursor`` while ``has_more``;
+        keep the last one for the next sync. A cursor older than the tombstone
+        retention window gets 410 Gone: drop local state and sync without one.
+        """
+        tasks = Task.all_objects.all()
+        if not request.user.is_staff:
+            tasks = tasks.filter(created_by=request.user)
+        try:
+            limit = min(int(request.query_params.get("limit", self.changes_page_size)), self.changes_max_page_size)
+        except ValueError:
+            return Response({"detail": "limit must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+        row_serializer = self.get_row_serializer()
+        if row_serializer is not None:
+            tasks = row_serializer.values(tasks)
+        try:
+            page, cursor, has_more = sync.changes_since(tasks, request.query_params.get("since"), max(limit, 1))
+        except ValueError:
+            return Response({"detail": "Invalid cursor"}, status=status.HTTP_400_BAD_REQUEST)
+        except sync.CursorExpired:
+            return Response({"detail": "Cursor expired; sync again without since"}, status=status.HTTP_410_GONE)
+        results = row_serializer.many(page) if row_serializer else self.get_serializer(page, many=True).data
+        return Response({"results": results, "cursor": cursor, "has_more": has_more})
+
+    @action(detail=False, methods=["get"])
+    def export(self, request):
+        """
+        Stream the filtered, ordered task list as NDJSON (``?output=ndjson``, default)
+        or CSV (``?output=csv``). Rows come from a server-side cursor in chunks, so
+        memory stays flat however many tasks are exported.
+        """
+        output = request.query_params.get("output", "ndjson")
+        if output not in ("ndjson", "csv"):
+            return Response({"detail": "output must be ndjson or csv"}, status=status.HTTP_400_BAD_REQUEST)
+
+        tasks = self.filter_queryset(self.get_queryset())
+        serializer, row_serializer = self.get_serializer(), self.get_row_serializer()
+        if row_serializer is not None:
+            tasks = row_serializer.values(tasks)
+            render = row_serializer.bind()
+        else:
+            render = serializer.to_representation
+        # Rows are read while the response streams, after the request's routing
+        # context is gone; pin the alias chosen now.
+        tasks = tasks.using(tasks.db).iterator(chunk_size=self.export_chunk_size)
+        rows = map(render, tasks)
+        if output == "csv":
+            content, content_type = csv_lines(rows, list(serializer.fields)), "text/csv"
+        else:
+            content, content_type = ndjson_lines(rows), "application/x-ndjson"
+
+        response = StreamingHttpResponse(batched(content, self.export_chunk_size), content_type=content_type)
+        response["Content-Disposition"] = f'attachment; filename="tasks.{output}"'
+        return response
+
+    @action(detail=False, methods=["get"])
+    def stats(self, request):
+        user = None if request.user.is_staff else request.user
+        return Response(counters.stats_for(user))
 
 
-class CategoryViewSet(viewsets.ModelViewSet):
+class CategoryViewSet(ReplicaReadsMixin, ResponseCacheMixin, LookupCacheMixin, ConditionalGetMixin, viewsets.ModelViewSet):
     serializer_class = CategorySerializer
     permission_classes = [permissions.IsAuthenticated, IsOwnerOrAdmin]
     filter_backends = [filters.OrderingFilter, filters.SearchFilter]
     ordering_fields = ["created_at", "name"]
+    ordering = ["-created_at"]
     search_fields = ["name", "description"]
 
     def get_queryset(self):
+        if getattr(self, "swagger_fake_view", False):
+            return Category.objects.none()
         if self.request.user.is_staff:
             return Category.objects.all()
         return Category.objects.filter(created_by=self.request.user)
 
     def perform_create(self, serializer):
         serializer.save(created_by=self.request.user)
+        lookups.invalidate(Category, self.request.user.pk)
+        responsecache.bump(self.request.user.pk)
+        events.publish(self.request.user.pk, "category", "created", [serializer.instance.pk])
+
+    def perform_update(self, serializer):
+        super().perform_update(serializer)
+        lookups.invalidate(Category, serializer.instance.created_by_id)
+        responsecache.bump(serializer.instance.created_by_id)
+        events.publish(serializer.instance.created_by_id, "category", "updated", [serializer.instance.pk])
 
     def perform_destroy(self, instance):
         if self.request.user.is_staff:
-            Category.all_objects.filter(pk=instance.pk).delete()
+            with transaction.atomic():
+                detach_tasks("category", instance.pk)
+                Category.all_objects.filter(pk=instance.pk).delete()
         else:
             instance.deleted = True
             instance.deleted_at = timezone.now()
-            instance.save(update_fields=["deleted", "deleted_at"])
+            instance.save(update_fields=["deleted", "deleted_at", "updated_at"])
+        lookups.invalidate(Category, instance.created_by_id)
+        responsecache.bump(instance.created_by_id)
+        events.publish(instance.created_by_id, "category", "deleted", [instance.pk])
 
 
-class PriorityViewSet(viewsets.ModelViewSet):
+class PriorityViewSet(ReplicaReadsMixin, ResponseCacheMixin, LookupCacheMixin, ConditionalGetMixin, viewsets.ModelViewSet):
     serializer_class = PrioritySerializer
     permission_classes = [permissions.IsAuthenticated, IsOwnerOrAdmin]
     filter_backends = [filters.OrderingFilter, filters.SearchFilter]
     ordering_fields = ["created_at", "name"]
+    ordering = ["-created_at"]
     search_fields = ["name"]
 
     def get_queryset(self):
+        if getattr(self, "swagger_fake_view", False):
+            return Priority.objects.none()
         if self.request.user.is_staff:
             return Priority.objects.all()
         return Priority.objects.filter(created_by=self.request.user)
 
     def perform_create(self, serializer):
         serializer.save(created_by=self.request.user)
+        lookups.invalidate(Priority, self.request.user.pk)
+        responsecache.bump(self.request.user.pk)
+        events.publish(self.request.user.pk, "priority", "created", [serializer.instance.pk])
+
+    def perform_update(self, serializer):
+        super().perform_update(serializer)
+        lookups.invalidate(Priority, serializer.instance.created_by_id)
+        responsecache.bump(serializer.instance.created_by_id)
+        events.publish(serializer.instance.created_by_id, "priority", "updated", [serializer.instance.pk])
 
     def perform_destroy(self, instance):
         if self.request.user.is_staff:
-            Priority.all_objects.filter(pk=instance.pk).delete()
+            with transaction.atomic():
+                detach_tasks("priority", instance.pk)
+                Priority.all_objects.filter(pk=instance.pk).delete()
         else:
             instance.deleted = True
             instance.deleted_at = timezone.now()
-            instance.save(update_fields=["deleted", "deleted_at"]) 
+            instance.save(update_fields=["deleted", "deleted_at", "updated_at"])
+        lookups.invalidate(Priority, instance.created_by_id)
+        responsecache.bump(instance.created_by_id)
+        events.publish(instance.created_by_id, "priority", "deleted", [instance.pk])
+
+
+class TaskFilterPresetViewSet(viewsets.ModelViewSet):
+    serializer_class = TaskFilterPresetSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    ordering = ["name"]
+
+    def get_queryset(self):
+        if getattr(self, "swagger_fake_view", False):
+            return TaskFilterPreset.objects.none()
+        return TaskFilterPreset.objects.filter(user=self.request.user).order_by("name")
+
+    def perform_create(self, serializer):
+        serializer.save(user=self.request.user)
+
+    def perform_update(self, serializer):
+        super().perform_update(serializer)
+        # Cached ?preset= responses were computed with the old parameters.
+        responsecache.bump(self.request.user.pk)
+
+    def perform_destroy(self, instance):
+        super().perform_destroy(instance)
+        responsecache.bump(self.request.user.pk)
+
+    @action(detail=True, methods=["get"])
+    def count(self, request, pk=None):
+        """
+        How many of the user's tasks match the preset: from the stats counters when it
+        filters on one counted dimension, otherwise with a COUNT over the indexes.
+        """
+        preset = self.get_object()
+        filterset = TaskFilter(preset.params, queryset=Task.objects.filter(created_by=request.user))
+        if not filterset.is_valid():
+            return Response(filterset.errors, status=status.HTTP_400_BAD_REQUEST)
+        count = counters.count_filtered(request.user.pk, filterset.form.cleaned_data)
+        if count is not None:
+            return Response({"count": count, "source": "counters"})
+        return Response({"count": filterset.qs.count(), "source": "query"})
+
+
+class LookupCacheStatsView(APIView):
+    """Hit/miss counters of the Category/Priority lookup cache in this process."""
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        return Response(lookups.stats())
+
+
+class ObtainTokenView(ObtainAuthToken):
+    """``obtain_auth_token`` with the password check rate limited per client IP."""
+    throttle_classes = [TokenBucketThrottle]
+    throttle_scope = "expensive"
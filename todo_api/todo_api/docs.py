@@ -0,0 +1,58 @@
+"""
+Swagger / ReDoc routes that import ``drf_yasg`` on their first request rather
+than at URLconf import, so workers that never serve the docs never pay for it.
+"""
+import threading
+
+from rest_framework import permissions
+from rest_framework.response import Response
+
+
+# renderer -> view function; None -> the schema view class they share.
+_views = {}
+_lock = threading.Lock()
+
+
+def build_schema_view():
+    """The drf_yasg schema view, keeping each generated schema for the life of the process."""
+    from drf_yasg import openapi
+    from drf_yasg.renderers import _SpecRenderer
+    from drf_yasg.views import get_schema_view
+
+    base = get_schema_view(
+        openapi.Info(
+            title="ToDo API",
+            default_version='v1',
+            description="API documentation for To-Do service",
+        ),
+        public=True,
+        permission_classes=(permissions.AllowAny,),
+    )
+
+    class CachedSchemaView(base):
+        schemas = {}
+
+        def get(self, request, version="", format=None):
+            # The UI pages build an empty schema; only the spec itself is worth keeping.
+            if not isinstance(request.accepted_renderer, _SpecRenderer):
+                return super().get(request, version, format)
+            key = (request.build_absolute_uri("/"), request.version or version or "")
+            if key not in self.schemas:
+                self.schemas[key] = super().get(request, version, format).data
+            return Response(self.schemas[key])
+
+    return CachedSchemaView
+
+
+def lazy_ui(renderer):
+    """A view function serving ``schema_view.with_ui(renderer)``, built on first use."""
+    def view(request, *args, **kwargs):
+        if renderer not in _views:
+            with _lock:
+                if None not in _views:
+                    _views[None] = build_schema_view()
+                if renderer not in _views:
+                    _views[renderer] = _views[None].with_ui(renderer, cache_timeout=0)
+        return _views[renderer](request, *args, **kwargs)
+    view.csrf_exempt = True
+    return view
@@ -12,11 +12,13 @@ https://docs.djangoproject.com/en/4.2/ref/settings/
 
 import os
 from pathlib import Path
-from dotenv import load_dotenv
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
-load_dotenv(BASE_DIR / '.env')
+if (BASE_DIR / '.env').exists():
+    from dotenv import load_dotenv
+
+    load_dotenv(BASE_DIR / '.env')
 
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/4.2/howto/deployment/checklist/
@@ -32,6 +34,11 @@ ALLOWED_HOSTS = []
 
 # Application definition
 
+# Swagger/ReDoc (drf_yasg, imported on the first docs request) and the admin
+# site; API_DOCS=0 / ADMIN_ENABLED=0 leave them out for faster worker boots.
+API_DOCS = os.environ.get('API_DOCS', '1') == '1'
+ADMIN_ENABLED = os.environ.get('ADMIN_ENABLED', '1') == '1'
+
 INSTALLED_APPS = [
     'drf_yasg',
     'django.contrib.admin',
@@ -48,8 +55,13 @@ INSTALLED_APPS = [
     "todo_api"
 
 ]
+if not API_DOCS:
+    INSTALLED_APPS.remove('drf_yasg')
+if not ADMIN_ENABLED:
+    INSTALLED_APPS.remove('django.contrib.admin')
 
 MIDDLEWARE = [
+    'api.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -57,6 +69,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'api.hashers.HashingBusyMiddleware',
 ]
 
 ROOT_URLCONF = 'todo_api.urls'
@@ -83,21 +96,48 @@ WSGI_APPLICATION = 'todo_api.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
+DB_ENGINE = os.environ.get('DB_ENGINE', 'django.db.backends.postgresql')
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
-        'NAME': 'todo',
-        'USER': 'todo',
-        'PASSWORD':'todo',
-        'HOST': 'localhost',
+        'ENGINE': DB_ENGINE,
+        'NAME': os.environ.get('DB_NAME', 'todo'),
+        'USER': os.environ.get('DB_USER', 'todo'),
+        'PASSWORD': os.environ.get('DB_PASSWORD', 'todo'),
+        'HOST': os.environ.get('DB_HOST', 'localhost'),
         # 'HOST': 'db',
-        'PORT': '5432',
+        'PORT': os.environ.get('DB_PORT', '5432'),
+        # Keep connections open between requests instead of reconnecting per request.
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': True,
+        # Set DB_POOLER=transaction when connecting through PgBouncer in transaction
+        # pooling mode: named (server-side) cursors do not survive across transactions.
+        'DISABLE_SERVER_SIDE_CURSORS': os.environ.get('DB_POOLER') == 'transaction',
     }
 }
 
+# Read replicas: comma-separated hosts (or database file names for SQLite). Safe
+# requests of the task/category/priority endpoints are routed to them, see
+# api.routers.PrimaryReplicaRouter.
+DATABASE_REPLICAS = []
+for _i, _replica in enumerate(filter(None, os.environ.get('DB_REPLICAS', '').split(',')), start=1):
+    _location = {'NAME': _replica} if 'sqlite' in DB_ENGINE else {'HOST': _replica}
+    DATABASES[f'replica{_i}'] = {**DATABASES['default'], **_location, 'TEST': {'MIRROR': 'default'}}
+    DATABASE_REPLICAS.append(f'replica{_i}')
+
+DATABASE_ROUTERS = ['api.routers.PrimaryReplicaRouter']
+
+# After a write, the user's reads stay on the primary this long (read-your-writes).
+REPLICA_STICKY_SECONDS = int(os.environ.get('REPLICA_STICKY_SECONDS', 5))
+# The "replica_sticky" cache remembers those writes. Every worker must see it, so
+# with replicas and more than one worker point REPLICA_STICKY_CACHE_URL at a
+# shared Redis (redis://host:6379/3); the local-memory default is per process.
+REPLICA_STICKY_CACHE = 'replica_sticky'
+REPLICA_STICKY_CACHE_URL = os.environ.get('REPLICA_STICKY_CACHE_URL')
+
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": [
-        "rest_framework.authentication.TokenAuthentication",
+        "api.authentication.CachedTokenAuthentication",
     ],
     "DEFAULT_PERMISSION_CLASSES": [
         "rest_framework.permissions.IsAuthenticated",
@@ -105,8 +145,129 @@ REST_FRAMEWORK = {
     "DEFAULT_FILTER_BACKENDS": [
         "django_filters.rest_framework.DjangoFilterBackend",
         "rest_framework.filters.OrderingFilter"],
+    "DEFAULT_PAGINATION_CLASS": "api.pagination.KeysetPagination",
+    "PAGE_SIZE": int(os.environ.get("API_PAGE_SIZE", 100)),
+    # Token buckets per user (or IP) and scope; views map actions to scopes.
+    "DEFAULT_THROTTLE_CLASSES": ["api.throttling.TokenBucketThrottle"],
+    "DEFAULT_THROTTLE_RATES": {
+        "cheap": os.environ.get("THROTTLE_RATE_CHEAP", "600/min"),
+        "expensive": os.environ.get("THROTTLE_RATE_EXPENSIVE", "60/min"),
+    },
+    # Anonymous clients are throttled per IP. With 0 that is REMOTE_ADDR; behind N
+    # trusted proxies set it to N so the client's address is read from
+    # X-Forwarded-For, which is otherwise ignored as client-controlled.
+    "NUM_PROXIES": int(os.environ.get("API_NUM_PROXIES", 0)),
 }
 
+# In-flight requests one user may have per scope (api.throttling.ConcurrencyLimitMixin).
+THROTTLE_CONCURRENCY = {
+    "expensive": int(os.environ.get("THROTTLE_CONCURRENCY_EXPENSIVE", 4)),
+}
+# Share buckets and in-flight counts between nodes (redis://host:6379/2);
+# without it they live in the "throttle" cache of each process.
+THROTTLE_REDIS_URL = os.environ.get('THROTTLE_REDIS_URL')
+
+# Change events streamed at /api/events/ (api.events). With EVENTS_REDIS_URL set
+# they are relayed through Redis pub/sub so every node's subscribers get them.
+EVENTS_REDIS_URL = os.environ.get('EVENTS_REDIS_URL')
+EVENTS_BACKEND = os.environ.get('EVENTS_BACKEND', 'api.events.RedisBroker' if EVENTS_REDIS_URL else 'api.events.LocalBroker')
+# Events buffered per connection before a slow client is cut off with "overflow".
+EVENTS_BUFFER_SIZE = int(os.environ.get('EVENTS_BUFFER_SIZE', 100))
+EVENTS_MAX_CONNECTIONS = int(os.environ.get('EVENTS_MAX_CONNECTIONS', 5))
+EVENTS_KEEPALIVE = float(os.environ.get('EVENTS_KEEPALIVE', 15))
+EVENTS_RETRY_MS = int(os.environ.get('EVENTS_RETRY_MS', 3000))
+# Streams end after this long (clients reconnect), so connections the server
+# never noticed closing do not keep their subscription forever.
+EVENTS_STREAM_SECONDS = float(os.environ.get('EVENTS_STREAM_SECONDS', 300))
+
+
+# Caches
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+
+# "tokens" backs CachedTokenAuthentication. Point TOKEN_CACHE_URL at Redis
+# (redis://host:6379/1) to share it between workers.
+TOKEN_CACHE_URL = os.environ.get('TOKEN_CACHE_URL')
+# "responses" backs the per-user list/retrieve cache. The local-memory default
+# only sees writes made in its own process, so run more than one worker only
+# with RESPONSE_CACHE_URL pointing at a shared Redis.
+RESPONSE_CACHE_URL = os.environ.get('RESPONSE_CACHE_URL')
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'tokens': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': TOKEN_CACHE_URL,
+        'TIMEOUT': int(os.environ.get('TOKEN_CACHE_TIMEOUT', 300)),
+    } if TOKEN_CACHE_URL else {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'tokens',
+        'TIMEOUT': int(os.environ.get('TOKEN_CACHE_TIMEOUT', 300)),
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+    'replica_sticky': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': REPLICA_STICKY_CACHE_URL,
+    } if REPLICA_STICKY_CACHE_URL else {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'replica-sticky',
+    },
+    'throttle': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'throttle',
+        'OPTIONS': {'MAX_ENTRIES': 100000},
+    },
+    'responses': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': RESPONSE_CACHE_URL,
+        'TIMEOUT': int(os.environ.get('RESPONSE_CACHE_TIMEOUT', 30)),
+    } if RESPONSE_CACHE_URL else {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'responses',
+        'TIMEOUT': int(os.environ.get('RESPONSE_CACHE_TIMEOUT', 30)),
+        'OPTIONS': {'MAX_ENTRIES': int(os.environ.get('RESPONSE_CACHE_MAX_ENTRIES', 1000))},
+    },
+}
+
+# Soft-deleted rows are kept (as delta-sync tombstones) this long before
+# purge_deleted may remove them; older sync cursors are rejected.
+SOFT_DELETE_RETENTION_DAYS = int(os.environ.get('SOFT_DELETE_RETENTION_DAYS', 30))
+
+# Per-user Category/Priority lookup tables. Use a shared cache in multi-process
+# deployments so an invalidation reaches every worker.
+LOOKUP_CACHE = 'default'
+LOOKUP_CACHE_TIMEOUT = int(os.environ.get('LOOKUP_CACHE_TIMEOUT', 300))
+
+# /metrics requires "Authorization: Bearer <METRICS_TOKEN>" when this is set.
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN') or None
+# Log the SQL of requests slower than this many seconds (off when unset).
+SLOW_REQUEST_SECONDS = float(os.environ['SLOW_REQUEST_SECONDS']) if os.environ.get('SLOW_REQUEST_SECONDS') else None
+
+
+# Password hashing (api.hashers). The first hasher makes new hashes; the others
+# still verify older ones, which are rehashed with the first on the next login,
+# as are hashes whose work factors differ from the settings below.
+# PASSWORD_HASHER=argon2 prefers Argon2 (requires argon2-cffi).
+PASSWORD_HASHERS = [
+    'api.hashers.PBKDF2PasswordHasher',
+    'api.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+if os.environ.get('PASSWORD_HASHER') == 'argon2':
+    PASSWORD_HASHERS[:2] = reversed(PASSWORD_HASHERS[:2])
+PASSWORD_PBKDF2_ITERATIONS = int(os.environ.get('PASSWORD_PBKDF2_ITERATIONS', 600000))
+PASSWORD_ARGON2_TIME_COST = int(os.environ.get('PASSWORD_ARGON2_TIME_COST', 2))
+PASSWORD_ARGON2_MEMORY_COST = int(os.environ.get('PASSWORD_ARGON2_MEMORY_COST', 102400))
+PASSWORD_ARGON2_PARALLELISM = int(os.environ.get('PASSWORD_ARGON2_PARALLELISM', 8))
+# Hashes run on this many pool threads per process; at most PASSWORD_HASH_QUEUE
+# more wait for one, and further requests get a 503 at once. Keep the sum below
+# the request threads per process so hashing can never occupy all of them.
+PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', 2))
+PASSWORD_HASH_QUEUE = int(os.environ.get('PASSWORD_HASH_QUEUE', 2))
+# Logins hold one hashing slot for the whole password check (api.hashers.hashing_slot).
+AUTHENTICATION_BACKENDS = ['api.authentication.PasswordBackend']
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
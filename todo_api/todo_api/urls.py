@@ -14,29 +14,27 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
-from django.contrib import admin
+from django.conf import settings
 from django.urls import path, include
-from rest_framework.authtoken.views import obtain_auth_token
-from drf_yasg.views import get_schema_view
-from drf_yasg import openapi
-from rest_framework import permissions
+from api.metrics import metrics_view
+from api.views import ObtainTokenView
 
 
-
-schema_view = get_schema_view(
-    openapi.Info(
-        title="ToDo API",
-        default_version='v1',
-        description="API documentation for To-Do service",
-    ),
-    public=True,
-    permission_classes=(permissions.AllowAny,),
-)
-
 urlpatterns = [
-    path('swagger/', schema_view.with_ui('swagger', cache_timeout=0), name='schema-swagger-ui'),
-    path('redoc/', schema_view.with_ui('redoc', cache_timeout=0), name='schema-redoc'),
-    path('admin/', admin.site.urls),
-    path("api/token/", obtain_auth_token, name="api_token_auth"),
+    path("api/token/", ObtainTokenView.as_view(), name="api_token_auth"),
     path("api/", include("api.urls")),
-] 
+    path("metrics", metrics_view, name="metrics"),
+]
+
+if settings.API_DOCS:
+    from .docs import lazy_ui
+
+    urlpatterns += [
+        path('swagger/', lazy_ui('swagger'), name='schema-swagger-ui'),
+        path('redoc/', lazy_ui('redoc'), name='schema-redoc'),
+    ]
+
+if settings.ADMIN_ENABLED:
+    from django.contrib import admin
+
+    urlpatterns.append(path('admin/', admin.site.urls))